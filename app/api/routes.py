@@ -1,18 +1,187 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Query, Response
+from pydantic import BaseModel, Field
+from datetime import datetime
+from typing import Literal, Optional
 from app.services.ranking_service import RankingService
+from app.services.job_service import JobService
+from app.services.tracking_service import TrackingService, TrackingError
+from app.config import settings
+from app.utils.scraper import driver_pool
+import asyncio
 import logging
 
 router = APIRouter()
 ranking_service = RankingService()
+job_service = JobService(ranking_service)
+if not settings.EMBEDDED_WORKER:
+    # Scrapes run in `python -m app.worker` processes; the API waits for their jobs instead
+    ranking_service.job_queue = job_service
+tracking_service = TrackingService(ranking_service.SessionLocal)
+
+class TrackedRestaurantIn(BaseModel):
+    """Restaurant to add to the tracking registry"""
+    restaurant_slug: str
+    interval_minutes: Optional[int] = Field(None, ge=1, description="Defaults to SCRAPING_INTERVAL_MINUTES")
+    priority: int = 0
+    enabled: bool = True
+
+class TrackedRestaurantUpdate(BaseModel):
+    """Changes to a tracked restaurant; omitted fields are left as they are"""
+    interval_minutes: Optional[int] = Field(None, ge=1)
+    priority: Optional[int] = None
+    enabled: Optional[bool] = None
 
 @router.get("/rank/{restaurant_slug}")
-async def get_rank(restaurant_slug: str):
+async def get_rank(
+    restaurant_slug: str,
+    response: Response,
+    max_age: Optional[int] = Query(None, ge=0, description="Maximum age in seconds of a stored ranking to serve; 0 forces a scrape"),
+    backend: Optional[Literal["auto", "http", "selenium"]] = None,
+):
     """Get current ranking for a restaurant"""
+    if max_age is None:
+        max_age = settings.RANK_CACHE_MAX_AGE_SECONDS
     try:
-        result = await ranking_service.get_current_ranking(restaurant_slug)
-        if result is None:
-            raise HTTPException(status_code=404, detail="Restaurant not found or currently closed")
-        return result
+        result, cache_status, age = await ranking_service.get_cached_ranking(restaurant_slug, max_age, backend=backend)
+    except asyncio.TimeoutError as e:
+        logging.error(str(e))
+        raise HTTPException(status_code=504, detail="Timed out waiting for a scraper worker")
     except Exception as e:
         logging.error(f"Error getting rank for {restaurant_slug}: {str(e)}")
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+
+    if result is None:
+        raise HTTPException(status_code=404, detail="Restaurant not found or currently closed")
+    response.headers["X-Cache"] = cache_status
+    response.headers["Age"] = str(int(age))
+    return result
+
+@router.get("/rank/{restaurant_slug}/history")
+async def get_rank_history(
+    restaurant_slug: str,
+    start: Optional[datetime] = Query(None, alias="from", description="Only rankings at or after this time"),
+    end: Optional[datetime] = Query(None, alias="to", description="Only rankings at or before this time"),
+    cursor: Optional[datetime] = Query(None, description="next_cursor of the previous page"),
+    limit: int = Query(100, ge=1, le=1000),
+    bucket: Optional[Literal["hour", "day", "week"]] = Query(None, description="Aggregate per hour, day or week"),
+):
+    """Get ranking history for a restaurant, newest first
+
+    Ranges reaching past the retention of the requested granularity are served from a coarser
+    rollup; `bucket` in the response says which was used.
+    """
+    try:
+        bucket = ranking_service.history_bucket(bucket, start, end)
+        if bucket:
+            items = await ranking_service.get_ranking_buckets(
+                restaurant_slug, bucket, limit=limit, start=start, end=end, before=cursor
+            )
+            cursor_key = 'bucket_start'
+        else:
+            items = await ranking_service.get_ranking_history(
+                restaurant_slug, limit=limit, start=start, end=end, before=cursor
+            )
+            cursor_key = 'timestamp'
+    except Exception as e:
+        logging.error(f"Error getting rank history for {restaurant_slug}: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+    return {
+        'restaurant_slug': restaurant_slug,
+        'bucket': bucket,
+        'items': items,
+        'next_cursor': items[-1][cursor_key] if len(items) == limit else None,
+    }
+
+@router.post("/rank/{restaurant_slug}/refresh", status_code=202)
+async def refresh_rank(restaurant_slug: str, backend: Optional[Literal["auto", "http", "selenium"]] = None):
+    """Queue a ranking refresh for a restaurant and return its job"""
+    try:
+        return await job_service.enqueue(restaurant_slug, backend)
+    except Exception as e:
+        logging.error(f"Error queueing refresh for {restaurant_slug}: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """Get the status and result of a refresh job"""
+    try:
+        job = await job_service.get_job(job_id)
+    except Exception as e:
+        logging.error(f"Error getting job {job_id}: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@router.get("/tracked")
+async def list_tracked():
+    """List tracked restaurants, next due first"""
+    try:
+        return await tracking_service.list()
+    except Exception as e:
+        logging.error(f"Error listing tracked restaurants: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/tracked", status_code=201)
+async def add_tracked(restaurant: TrackedRestaurantIn):
+    """Start tracking a restaurant"""
+    try:
+        return await tracking_service.add(
+            restaurant.restaurant_slug,
+            interval_minutes=restaurant.interval_minutes,
+            priority=restaurant.priority,
+            enabled=restaurant.enabled,
+        )
+    except TrackingError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except Exception as e:
+        logging.error(f"Error tracking {restaurant.restaurant_slug}: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/tracked/{restaurant_slug}")
+async def get_tracked(restaurant_slug: str):
+    """Get a tracked restaurant"""
+    try:
+        restaurant = await tracking_service.get(restaurant_slug)
+    except Exception as e:
+        logging.error(f"Error getting tracked restaurant {restaurant_slug}: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+    if restaurant is None:
+        raise HTTPException(status_code=404, detail="Restaurant is not tracked")
+    return restaurant
+
+@router.patch("/tracked/{restaurant_slug}")
+async def update_tracked(restaurant_slug: str, changes: TrackedRestaurantUpdate):
+    """Change a tracked restaurant's interval, priority or enabled flag"""
+    # An explicit null interval goes back to the default; priority and enabled can't be cleared
+    fields = {key: value for key, value in changes.model_dump(exclude_unset=True).items()
+              if value is not None or key == 'interval_minutes'}
+    try:
+        restaurant = await tracking_service.update(restaurant_slug, **fields)
+    except Exception as e:
+        logging.error(f"Error updating tracked restaurant {restaurant_slug}: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+    if restaurant is None:
+        raise HTTPException(status_code=404, detail="Restaurant is not tracked")
+    return restaurant
+
+@router.delete("/tracked/{restaurant_slug}", status_code=204)
+async def remove_tracked(restaurant_slug: str):
+    """Stop tracking a restaurant"""
+    try:
+        removed = await tracking_service.remove(restaurant_slug)
+    except Exception as e:
+        logging.error(f"Error removing tracked restaurant {restaurant_slug}: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+    if not removed:
+        raise HTTPException(status_code=404, detail="Restaurant is not tracked")
+
+@router.get("/scraper/pool")
+async def get_pool_stats():
+    """Get Chrome driver pool statistics"""
+    return driver_pool.stats()
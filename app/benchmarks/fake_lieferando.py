@@ -0,0 +1,243 @@
+"""Local stand-in for lieferando.de serving synthetic menu pages and area listings
+
+    python -m app.benchmarks.fake_lieferando --port 8081 --cards 300 --batch-size 30 --latency-ms 200
+
+Then point the scraper at it with BASE_LIEFERANDO_URL=http://localhost:8081.
+
+Every area serves the same `--cards` restaurants, fake-restaurant-1 to fake-restaurant-N, ranked
+in that order. Their menu pages carry an "Über uns" button opening the address modal, and
+listings render the first `--batch-size` cards and append another batch whenever the page is
+scrolled to the bottom, using the data-qa attributes the scraper relies on. With
+`--server-rendered` menu pages also carry JSON-LD and listings render every card up front along
+with page state giving their total count, so the plain HTTP backend can resolve everything and
+store complete snapshots on its own. With `--assets` listings also load a stylesheet, web fonts,
+a hero image, a favicon and a logo per card, for measuring what lean browser mode blocks.
+"""
+from aiohttp import web
+import argparse
+import asyncio
+import html
+import json
+from typing import Optional
+
+SLUG_PREFIX = "fake-restaurant-"
+
+# Bytes served per asset with --assets; logo URLs carry a resize query like the real CDN's
+ASSET_SIZES = {
+    'app.css': 40 * 1024,
+    'font-regular.woff2': 30 * 1024,
+    'font-bold.woff2': 30 * 1024,
+    'hero.jpg': 120 * 1024,
+    'favicon.ico': 15 * 1024,
+    'logo.webp': 8 * 1024,
+}
+ASSET_TYPES = {
+    'css': 'text/css',
+    'woff2': 'font/woff2',
+    'jpg': 'image/jpeg',
+    'ico': 'image/x-icon',
+    'webp': 'image/webp',
+}
+
+ASSETS_HEAD = """<link rel="stylesheet" href="/_fake/assets/app.css">
+<link rel="preload" as="font" type="font/woff2" crossorigin href="/_fake/assets/font-regular.woff2">
+<link rel="preload" as="font" type="font/woff2" crossorigin href="/_fake/assets/font-bold.woff2">
+<link rel="icon" href="/_fake/assets/favicon.ico">"""
+
+ASSETS_BODY = """<img src="/_fake/assets/hero.jpg" alt="" width="1200" height="300">"""
+
+LOGO = """<img src="/_fake/assets/logo.webp?restaurant={slug}&w=120" alt="" width="60" height="60">"""
+
+MENU_PAGE = """<!DOCTYPE html>
+<html lang="de">
+<head><meta charset="utf-8"><title>{name}</title>{json_ld}</head>
+<body>
+<h1>{name}</h1>
+<button data-qa="button" onclick="showInfo()">
+  <div data-qa="text">Über uns</div>
+</button>
+<div id="info"></div>
+<script>
+// Like the real modal, the address only exists once the button is clicked
+function showInfo() {{
+  const address = document.createElement('div');
+  address.setAttribute('data-qa', 'restaurant-info-modal-info-address-element');
+  address.innerText = {address};
+  document.getElementById('info').replaceChildren(address);
+}}
+</script>
+</body>
+</html>
+"""
+
+LISTING_PAGE = """<!DOCTYPE html>
+<html lang="de">
+<head><meta charset="utf-8"><title>Lieferservice {postal_code} {city}</title>{next_data}{assets_head}</head>
+<body>
+{assets_body}
+<div data-qa="list-all-open-content">{cards}</div>
+<script>
+let loaded = {loaded};
+let loading = false;
+const total = {total};
+const container = document.querySelector("[data-qa='list-all-open-content']");
+async function loadMore() {{
+  if (loading || loaded >= total) {{ return; }}
+  loading = true;
+  const response = await fetch(`/_fake/cards/{area}?offset=${{loaded}}`);
+  container.insertAdjacentHTML('beforeend', await response.text());
+  loaded = container.querySelectorAll("[data-qa='restaurant-card']").length;
+  loading = false;
+}}
+window.addEventListener('scroll', () => {{
+  if (window.innerHeight + window.scrollY >= document.body.scrollHeight - 200) {{ loadMore(); }}
+}});
+</script>
+</body>
+</html>
+"""
+
+CARD = """<div data-qa="restaurant-card" style="height:120px">
+  {logo}<a href="/speisekarte/{slug}">{name}</a>
+  <div data-qa="restaurant-ratings">{rating} ({votes})</div>
+</div>"""
+
+
+def _rating(position: int) -> str:
+    """Deterministic rating between 3,0 and 5,0 in German notation"""
+    return f"{3 + (position * 7 % 21) / 10:.1f}".replace('.', ',')
+
+
+class FakeLieferando:
+    """aiohttp application imitating the pages LieferandoScraper reads"""
+
+    def __init__(self, cards: int = 300, batch_size: int = 30, latency_ms: float = 0,
+                 server_rendered: bool = False, assets: bool = False):
+        self.cards = cards
+        self.batch_size = batch_size
+        self.latency = latency_ms / 1000
+        self.server_rendered = server_rendered
+        self.assets = assets
+        self.requests = 0
+        self.base_url: Optional[str] = None
+
+    def slug(self, position: int) -> str:
+        return f"{SLUG_PREFIX}{position}"
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_get('/speisekarte/{slug}', self.menu_page)
+        app.router.add_get('/lieferservice/essen/{area}', self.listing_page)
+        app.router.add_get('/_fake/cards/{area}', self.more_cards)
+        app.router.add_get('/_fake/assets/{name}', self.asset)
+        return app
+
+    async def start(self, host: str = '127.0.0.1', port: int = 0) -> web.AppRunner:
+        """Serve in the running event loop until the returned runner is cleaned up; sets `base_url`"""
+        runner = web.AppRunner(self.app(), access_log=None)
+        await runner.setup()
+        site = web.TCPSite(runner, host, port)
+        await site.start()
+        self.base_url = f"http://{host}:{runner.addresses[0][1]}"
+        return runner
+
+    async def _respond(self):
+        self.requests += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+    def _position(self, slug: str) -> Optional[int]:
+        if not slug.startswith(SLUG_PREFIX):
+            return None
+        try:
+            position = int(slug[len(SLUG_PREFIX):])
+        except ValueError:
+            return None
+        return position if 1 <= position <= self.cards else None
+
+    def _cards_html(self, start: int, end: int) -> str:
+        return ''.join(CARD.format(
+            logo=LOGO.format(slug=self.slug(position)) if self.assets else "",
+            slug=self.slug(position),
+            name=f"Fake Restaurant {position}",
+            rating=_rating(position),
+            votes=position * 13 % 997,
+        ) for position in range(start + 1, min(end, self.cards) + 1))
+
+    async def menu_page(self, request: web.Request) -> web.Response:
+        await self._respond()
+        slug = request.match_info['slug']
+        position = self._position(slug)
+        if position is None:
+            raise web.HTTPNotFound()
+
+        postal_code, city = "10115", "Berlin"
+        json_ld = ""
+        if self.server_rendered:
+            json_ld = '<script type="application/ld+json">' + json.dumps({
+                '@type': 'Restaurant',
+                'name': slug,
+                'address': {'postalCode': postal_code, 'addressLocality': city},
+            }) + '</script>'
+        return web.Response(content_type='text/html', text=MENU_PAGE.format(
+            name=html.escape(f"Fake Restaurant {position}"),
+            json_ld=json_ld,
+            address=json.dumps(f"Teststraße {position}\n{postal_code} {city}"),
+        ))
+
+    async def listing_page(self, request: web.Request) -> web.Response:
+        await self._respond()
+        area = request.match_info['area']
+        postal_code, _, city = area.partition('-')
+        loaded = self.cards if self.server_rendered else self.batch_size
+        next_data = ""
+        if self.server_rendered:
+            restaurants = [{'uniqueName': self.slug(position), 'rating': {'starRating': float(_rating(position).replace(',', '.'))}}
+                           for position in range(1, self.cards + 1)]
+            next_data = '<script id="__NEXT_DATA__" type="application/json">' + json.dumps({
+                'props': {'pageProps': {'restaurantList': {'restaurants': restaurants, 'totalCount': self.cards}}},
+            }) + '</script>'
+        return web.Response(content_type='text/html', text=LISTING_PAGE.format(
+            next_data=next_data,
+            assets_head=ASSETS_HEAD if self.assets else "",
+            assets_body=ASSETS_BODY if self.assets else "",
+            postal_code=html.escape(postal_code),
+            city=html.escape(city),
+            area=html.escape(area),
+            cards=self._cards_html(0, loaded),
+            loaded=min(loaded, self.cards),
+            total=self.cards,
+        ))
+
+    async def more_cards(self, request: web.Request) -> web.Response:
+        await self._respond()
+        offset = int(request.query.get('offset', 0))
+        return web.Response(content_type='text/html', text=self._cards_html(offset, offset + self.batch_size))
+
+    async def asset(self, request: web.Request) -> web.Response:
+        await self._respond()
+        name = request.match_info['name']
+        if not self.assets or name not in ASSET_SIZES:
+            raise web.HTTPNotFound()
+        return web.Response(body=bytes(ASSET_SIZES[name]), content_type=ASSET_TYPES[name.rpartition('.')[2]])
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve a synthetic lieferando.de for benchmarks and tests')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8081)
+    parser.add_argument('--cards', type=int, default=300, help='Restaurants per area listing')
+    parser.add_argument('--batch-size', type=int, default=30, help='Cards loaded per scroll')
+    parser.add_argument('--latency-ms', type=float, default=0, help='Delay added to every response')
+    parser.add_argument('--server-rendered', action='store_true', help='Render JSON-LD and full listings server-side')
+    parser.add_argument('--assets', action='store_true', help='Load images, fonts and a stylesheet on listings')
+
+    args = parser.parse_args()
+
+    fake = FakeLieferando(args.cards, args.batch_size, args.latency_ms, args.server_rendered, args.assets)
+    print(f"Serving fake Lieferando with {args.cards} restaurants per area on http://{args.host}:{args.port}")
+    web.run_app(fake.app(), host=args.host, port=args.port, print=None, access_log=None)
+
+
+if __name__ == "__main__":
+    main()
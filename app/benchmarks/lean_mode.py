@@ -0,0 +1,187 @@
+"""Compare page weight, load time and browser memory of lean and full Chrome drivers
+
+    python -m app.benchmarks.lean_mode --postal-code 50226 --city frechen --runs 3
+    python -m app.benchmarks.lean_mode --fake --runs 3
+    python -m app.benchmarks.lean_mode --fake --without-browser --latency-ms 50
+
+Each run scrolls through the complete area listing in a fresh driver, once per mode, and reports
+the bytes transferred (from Chrome's network log), requests made, time taken and browser memory.
+`--fake` measures against FakeLieferando serving its page assets instead of lieferando.de.
+`--without-browser` needs no Chrome: it fetches the fake listing, every batch of cards and the
+assets they reference over plain HTTP, skipping the URLs lean mode blocks, six at a time like
+Chrome's connections per host. It has no memory figures and leaves out scripts and rendering.
+"""
+from app.benchmarks.fake_lieferando import FakeLieferando
+from app.config import settings
+from app.utils.scraper import LEAN_BLOCKED_URLS, LieferandoScraper
+from app.utils.rate_limiter import HostRateLimiter
+from app.utils.driver_pool import process_tree_memory_mb
+from bs4 import BeautifulSoup
+from urllib.parse import urljoin
+import aiohttp
+import argparse
+import asyncio
+import json
+import re
+import statistics
+import threading
+import time
+from typing import Dict, List
+
+# Requests a browser opens to one host at a time
+CONNECTIONS_PER_HOST = 6
+
+# setBlockedURLs patterns only know * as a wildcard
+BLOCKED_URL_PATTERNS = [
+    re.compile('.*'.join(re.escape(part) for part in pattern.split('*')))
+    for pattern in LEAN_BLOCKED_URLS
+]
+
+
+def blocked_in_lean_mode(url: str) -> bool:
+    """Whether lean Chrome drivers block a request to the URL"""
+    return any(pattern.fullmatch(url) for pattern in BLOCKED_URL_PATTERNS)
+
+
+def _network_totals(driver) -> Dict[str, float]:
+    """Bytes received and requests finished, from the performance log collected since the last call"""
+    received = 0
+    requests = 0
+    for entry in driver.get_log('performance'):
+        message = json.loads(entry['message'])['message']
+        if message['method'] == 'Network.loadingFinished':
+            received += message['params'].get('encodedDataLength', 0)
+            requests += 1
+    return {'bytes': received, 'requests': requests}
+
+
+def measure(lean: bool, postal_code: str, city: str) -> Dict[str, float]:
+    options = LieferandoScraper._chrome_options(lean)
+    options.set_capability('goog:loggingPrefs', {'performance': 'ALL'})
+    driver = LieferandoScraper._create_driver(lean=lean, options=options)
+    try:
+        # Pacing between runs is done by the caller; this scraper never waits for the rate limiter
+        scraper = LieferandoScraper(rate_limiter=HostRateLimiter(requests_per_minute=6000, burst=100))
+        listing: List[Dict] = []
+        start = time.monotonic()
+        scraper._get_search_results(postal_code, city, [], driver, listing)
+        elapsed = time.monotonic() - start
+        return {
+            'seconds': elapsed,
+            'cards': len(listing),
+            'memory_mb': process_tree_memory_mb(driver.browser_pid) or 0,
+            **_network_totals(driver),
+        }
+    finally:
+        driver.quit()
+
+
+def _asset_urls(page_url: str, html: str) -> List[str]:
+    """Images, stylesheets, icons, fonts and scripts a page loads"""
+    soup = BeautifulSoup(html, 'html.parser')
+    urls = [img['src'] for img in soup.select('img[src]')] + [script['src'] for script in soup.select('script[src]')]
+    urls += [link['href'] for link in soup.select('link[href]')
+             if {'stylesheet', 'icon', 'preload'} & set(link.get('rel', []))]
+    return [urljoin(page_url, url) for url in urls]
+
+
+async def _replay_listing(lean: bool, base_url: str, postal_code: str, city: str) -> Dict[str, float]:
+    """Fetch a FakeLieferando listing, its batches of cards and their assets the way a browser would"""
+    totals = {'bytes': 0, 'requests': 0, 'cards': 0}
+    seen = set()
+    connections = asyncio.Semaphore(CONNECTIONS_PER_HOST)
+
+    async def fetch(session: aiohttp.ClientSession, url: str) -> str:
+        async with connections, session.get(url) as response:
+            body = await response.read()
+        totals['bytes'] += len(body)
+        totals['requests'] += 1
+        return body.decode('utf-8', errors='replace')
+
+    async def load(session: aiohttp.ClientSession, url: str) -> str:
+        html = await fetch(session, url)
+        assets = [asset for asset in _asset_urls(url, html)
+                  if asset not in seen and not (lean and blocked_in_lean_mode(asset))]
+        seen.update(assets)
+        await asyncio.gather(*(fetch(session, asset) for asset in assets))
+        totals['cards'] += html.count('data-qa="restaurant-card"')
+        return html
+
+    area = f"{postal_code}-{city.lower()}"
+    start = time.monotonic()
+    async with aiohttp.ClientSession() as session:
+        await load(session, f"{base_url}/lieferservice/essen/{area}")
+        while True:
+            cards = totals['cards']
+            await load(session, f"{base_url}/_fake/cards/{area}?offset={cards}")
+            if totals['cards'] == cards:
+                break
+    return {'seconds': time.monotonic() - start, 'memory_mb': 0, **totals}
+
+
+def _serve_fake(latency_ms: float) -> str:
+    """Serve FakeLieferando with assets from a background thread, returning its base URL"""
+    fake = FakeLieferando(latency_ms=latency_ms, assets=True)
+    loop = asyncio.new_event_loop()
+    started = threading.Event()
+
+    def serve():
+        loop.run_until_complete(fake.start())
+        started.set()
+        loop.run_forever()
+
+    threading.Thread(target=serve, name="fake-lieferando", daemon=True).start()
+    started.wait()
+    return fake.base_url
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure what lean browser mode saves on an area listing')
+    parser.add_argument('--postal-code', default='50226')
+    parser.add_argument('--city', default='frechen')
+    parser.add_argument('--runs', type=int, default=3)
+    parser.add_argument('--pause', type=float, default=10, help='Seconds between page loads, to stay polite')
+    parser.add_argument('--fake', action='store_true', help='Measure against FakeLieferando with page assets')
+    parser.add_argument('--latency-ms', type=float, default=0, help='Delay FakeLieferando adds to every response')
+    parser.add_argument('--without-browser', action='store_true',
+                        help='Replay the fake listing over plain HTTP instead of loading it in Chrome')
+
+    args = parser.parse_args()
+    if args.without_browser and not args.fake:
+        parser.error('--without-browser only works with --fake')
+
+    if args.fake:
+        settings.BASE_LIEFERANDO_URL = _serve_fake(args.latency_ms)
+        args.pause = 0
+
+    results = {True: [], False: []}
+    for run in range(args.runs):
+        for lean in (False, True):
+            if args.without_browser:
+                result = asyncio.run(_replay_listing(lean, settings.BASE_LIEFERANDO_URL, args.postal_code, args.city))
+            else:
+                result = measure(lean, args.postal_code, args.city)
+            results[lean].append(result)
+            print(f"run {run + 1} {'lean' if lean else 'full':<5} {result['seconds']:6.1f}s "
+                  f"{result['bytes'] / 1024:9.0f} KiB {result['requests']:5} requests "
+                  f"{result['memory_mb']:6.0f} MB {result['cards']:4} cards")
+            time.sleep(args.pause)
+
+    print()
+    print(f"{'median':<8} {'seconds':>8} {'KiB':>10} {'requests':>9} {'MB':>7}")
+    medians = {}
+    for lean in (False, True):
+        medians[lean] = {key: statistics.median(r[key] for r in results[lean])
+                         for key in ('seconds', 'bytes', 'requests', 'memory_mb')}
+        m = medians[lean]
+        print(f"{'lean' if lean else 'full':<8} {m['seconds']:8.1f} {m['bytes'] / 1024:10.0f} "
+              f"{m['requests']:9.0f} {m['memory_mb']:7.0f}")
+
+    full, lean = medians[False], medians[True]
+    if full['bytes'] and full['seconds']:
+        print(f"\nLean mode saves {100 * (1 - lean['bytes'] / full['bytes']):.0f}% of bytes and "
+              f"{100 * (1 - lean['seconds'] / full['seconds']):.0f}% of time")
+
+
+if __name__ == "__main__":
+    main()
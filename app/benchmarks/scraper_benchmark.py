@@ -0,0 +1,179 @@
+"""End-to-end scraper benchmarks against the local fake Lieferando
+
+    python -m app.benchmarks.scraper_benchmark --scenario lookup --backend http --iterations 20
+    python -m app.benchmarks.scraper_benchmark --scenario all --backend selenium --cards 300 --latency-ms 100
+
+Starts FakeLieferando in-process, points BASE_LIEFERANDO_URL at it and reports p50/p95 latency
+and throughput for:
+
+- lookup: LieferandoScraper.get_ranking for single restaurants, without caches or the database
+- cycle: a scheduler cycle, i.e. RankingService.get_current_rankings over a batch of restaurants
+- endpoint: GET /rank/{slug} served by uvicorn, forcing a scrape (max_age=0) and from the cache
+
+The cycle and endpoint scenarios store rankings in the database at DATABASE_URL.
+"""
+from app.benchmarks.fake_lieferando import FakeLieferando
+from app.config import settings
+import aiohttp
+import argparse
+import asyncio
+import math
+import socket
+import time
+from typing import Awaitable, Callable, Dict, List
+
+SCENARIOS = ("lookup", "cycle", "endpoint")
+
+
+def percentile(values: List[float], p: float) -> float:
+    """Nearest-rank percentile"""
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(p / 100 * len(ordered)) - 1)]
+
+
+async def run_timed(operation: Callable[[int], Awaitable[int]], iterations: int, concurrency: int) -> Dict:
+    """Run `operation(i)` for each iteration, `concurrency` at a time
+
+    `operation` returns how many items it handled, which throughput is based on.
+    """
+    latencies: List[float] = []
+    handled = 0
+    failures = 0
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def timed(i: int):
+        nonlocal handled, failures
+        async with semaphore:
+            start = time.monotonic()
+            try:
+                handled += await operation(i)
+            except Exception as e:
+                failures += 1
+                print(f"  iteration {i} failed: {e}")
+            latencies.append(time.monotonic() - start)
+
+    start = time.monotonic()
+    await asyncio.gather(*(timed(i) for i in range(iterations)))
+    elapsed = time.monotonic() - start
+    return {
+        'iterations': iterations,
+        'failures': failures,
+        'p50': percentile(latencies, 50),
+        'p95': percentile(latencies, 95),
+        'throughput': handled / elapsed if elapsed else 0.0,
+    }
+
+
+def report(name: str, result: Dict, unit: str):
+    print(f"{name:<16} {result['iterations']:>5} runs {result['failures']:>3} failed  "
+          f"p50 {result['p50'] * 1000:8.0f} ms  p95 {result['p95'] * 1000:8.0f} ms  "
+          f"{result['throughput']:7.2f} {unit}/s")
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+async def main(args):
+    fake = FakeLieferando(args.cards, args.batch_size, args.latency_ms, args.server_rendered)
+    runner = await fake.start()
+    settings.BASE_LIEFERANDO_URL = fake.base_url
+    settings.SCRAPER_BACKEND = args.backend
+    settings.EMBEDDED_WORKER = True  # The endpoint scrapes in-process rather than waiting for workers
+
+    # Imported once the settings point at the fake site
+    from app.utils.scraper import LieferandoScraper, driver_pool, scrape_executor, shared_http_scraper, shared_rate_limiter
+    # The fake site needs no politeness; buckets are created on first use, so this applies to it
+    shared_rate_limiter.rate = args.requests_per_minute / 60
+    shared_rate_limiter.burst = max(1, args.concurrency)
+
+    # Spread targets over the listing so some are found right away and some only after scrolling
+    positions = [max(1, round(args.cards * fraction)) for fraction in (0.05, 0.5, 0.95)]
+    slugs = [fake.slug(position) for position in positions]
+    scenarios = SCENARIOS if args.scenario == "all" else (args.scenario,)
+    print(f"Fake Lieferando at {fake.base_url}: {args.cards} cards, batches of {args.batch_size}, "
+          f"{args.latency_ms:.0f} ms latency, backend {args.backend}")
+
+    try:
+        if "lookup" in scenarios:
+            scraper = LieferandoScraper()
+
+            async def lookup(i: int) -> int:
+                ranking = await scraper.get_ranking(slugs[i % len(slugs)])
+                if ranking is None:
+                    raise RuntimeError(f"{slugs[i % len(slugs)]} not found")
+                return 1
+
+            report("lookup", await run_timed(lookup, args.iterations, args.concurrency), "lookups")
+
+        if "cycle" in scenarios or "endpoint" in scenarios:
+            from app.models.ranking import init_db
+            await init_db()
+
+        if "cycle" in scenarios:
+            from app.services.ranking_service import RankingService
+            ranking_service = RankingService()
+            cycle_slugs = [fake.slug(position) for position in range(1, args.cards + 1, max(1, args.cards // args.cycle_size))][:args.cycle_size]
+
+            async def cycle(i: int) -> int:
+                rankings = await ranking_service.get_current_rankings(cycle_slugs, concurrency=settings.SCHEDULER_WORKERS)
+                return sum(1 for ranking in rankings.values() if ranking)
+
+            # Cycles run one after another, as the scheduler runs them
+            report("cycle", await run_timed(cycle, max(1, args.iterations // 5), 1), "restaurants")
+
+        if "endpoint" in scenarios:
+            import uvicorn
+            from fastapi import FastAPI
+            from app.api.routes import router
+
+            app = FastAPI()
+            app.include_router(router)
+            port = _free_port()
+            server = uvicorn.Server(uvicorn.Config(app, host='127.0.0.1', port=port, log_level='warning'))
+            server.install_signal_handlers = lambda: None
+            server_task = asyncio.create_task(server.serve())
+            while not server.started:
+                await asyncio.sleep(0.05)
+
+            async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=600)) as session:
+                async def request(i: int, max_age: str) -> int:
+                    slug = slugs[i % len(slugs)]
+                    async with session.get(f"http://127.0.0.1:{port}/rank/{slug}?max_age={max_age}") as response:
+                        if response.status != 200:
+                            raise RuntimeError(f"HTTP {response.status} for {slug}")
+                        await response.read()
+                    return 1
+
+                report("endpoint scrape", await run_timed(lambda i: request(i, "0"), args.iterations, args.concurrency), "requests")
+                report("endpoint cached", await run_timed(lambda i: request(i, "3600"), args.iterations * 10, args.concurrency), "requests")
+
+            server.should_exit = True
+            await server_task
+
+        print(f"Fake Lieferando served {fake.requests} requests")
+    finally:
+        await shared_http_scraper.close()
+        scrape_executor.shutdown(wait=False)
+        driver_pool.close()
+        from app.models.database import engine
+        await engine.dispose()
+        await runner.cleanup()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark the scraper against a local fake Lieferando')
+    parser.add_argument('--scenario', choices=SCENARIOS + ("all",), default="all")
+    parser.add_argument('--backend', choices=["auto", "http", "selenium"], default=settings.SCRAPER_BACKEND)
+    parser.add_argument('--iterations', type=int, default=20)
+    parser.add_argument('--concurrency', type=int, default=1, help='Lookups or requests in flight at once')
+    parser.add_argument('--cycle-size', type=int, default=10, help='Restaurants per scheduler cycle')
+    parser.add_argument('--cards', type=int, default=300)
+    parser.add_argument('--batch-size', type=int, default=30)
+    parser.add_argument('--latency-ms', type=float, default=50)
+    parser.add_argument('--server-rendered', action='store_true')
+    parser.add_argument('--requests-per-minute', type=float, default=60000)
+
+    asyncio.run(main(parser.parse_args()))
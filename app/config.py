@@ -5,8 +5,78 @@ class Settings(BaseSettings):
     DATABASE_URL: str = "postgresql://user:password@db:5432/lanch_db"
     SCRAPING_INTERVAL_MINUTES: int = 60
     BASE_LIEFERANDO_URL: str = "https://www.lieferando.de"
-    
+
+    # Shared async connection pool
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 10
+
+    # Chrome driver pool
+    DRIVER_POOL_SIZE: int = 2
+    DRIVER_MAX_USES: int = 25  # Recycle a driver after this many checkouts
+    DRIVER_MAX_MEMORY_MB: int = 1500  # Recycle a driver once its browser uses more than this
+    DRIVER_CHECKOUT_TIMEOUT_SECONDS: int = 300
+
+    # "auto" tries plain HTTP first and falls back to Selenium; "http" or "selenium" force one backend
+    SCRAPER_BACKEND: str = "auto"
+    HTTP_SCRAPER_MAX_CONNECTIONS: int = 10
+    HTTP_SCRAPER_TIMEOUT_SECONDS: int = 20
+
+    # Scrapes run on a thread pool of this size so Selenium never blocks the event loop
+    SCRAPER_MAX_WORKERS: int = 2
+
+    # Scheduler parallelism and politeness towards lieferando.de
+    SCHEDULER_WORKERS: int = 2
+    RATE_LIMIT_REQUESTS_PER_MINUTE: float = 12
+    RATE_LIMIT_BURST: int = 2
+
+    # Each scheduler claims up to this many due restaurants at a time and holds them for the lease
+    SCHEDULER_BATCH_SIZE: int = 20
+    SCHEDULER_LEASE_SECONDS: int = 1800
+    SCHEDULER_POLL_SECONDS: int = 30
+
+    # Extract listing cards with one script call per scroll step instead of per-element lookups
+    SCRAPER_BULK_EXTRACTION: bool = True
+
+    # Lean browsers block images, fonts and trackers, return from page loads early and run with low-memory flags
+    SCRAPER_LEAN_MODE: bool = True
+    SCRAPER_LEAN_JS_HEAP_MB: int = 512
+
+    # /rank/{slug} serves stored rankings up to this age, and older ones up to the stale limit while refreshing
+    RANK_CACHE_MAX_AGE_SECONDS: int = 900
+    RANK_STALE_MAX_AGE_SECONDS: int = 86400
+
+    # "full" stores every observation; "changes" only writes a row when rank or rating changes
+    RANKING_STORAGE_MODE: str = "full"
+
+    # Store the complete listing of every scraped area; scheduler cycles then scroll each listing to the end
+    LISTING_SNAPSHOTS: bool = True
+
+    # History retention in days (0 keeps forever); daily rollups are always kept
+    RAW_RANKING_RETENTION_DAYS: int = 90
+    HOURLY_ROLLUP_RETENTION_DAYS: int = 365
+    LISTING_SNAPSHOT_RETENTION_DAYS: int = 30
+
+    # Background refresh jobs; a job running longer than the timeout is assumed lost and claimed again
+    JOB_WORKERS: int = 2
+    JOB_POLL_INTERVAL_SECONDS: int = 5
+    JOB_TIMEOUT_SECONDS: int = 900
+    JOB_MAX_ATTEMPTS: int = 3
+
+    # With EMBEDDED_WORKER off the API only enqueues scrapes and `python -m app.worker` runs them
+    EMBEDDED_WORKER: bool = True
+    WORKER_PROCESSES: int = 2
+    WORKER_REPLICAS: int = 1  # Worker containers running at once; they split the rate limit between them
+    WORKER_MAX_MEMORY_MB: int = 3000  # Per worker process including its browsers
+    WORKER_SHUTDOWN_GRACE_SECONDS: int = 120
+    WORKER_METRICS_PORT: int = 0  # When set, worker N serves Prometheus metrics on this port + N
+    # How long /rank/{slug} waits for a worker to finish a scrape
+    RANK_JOB_WAIT_SECONDS: int = 120
+
+    # Restaurant location cache
+    LOCATION_CACHE_TTL_HOURS: int = 168
+    LOCATION_CACHE_SIZE: int = 1024
+
     class Config:
         env_file = ".env"
 
-settings = Settings() 
\ No newline at end of file
+settings = Settings()
\ No newline at end of file
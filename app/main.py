@@ -1,8 +1,13 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
-from app.api.routes import router
+from app.api.routes import router, job_service, ranking_service
 from app.models.ranking import init_db
+from app.models.database import engine
+from app.config import settings
 from app.utils.scheduler import RankingScheduler
+from app.utils.scraper import driver_pool, scrape_executor, shared_http_scraper
+from prometheus_client import CONTENT_TYPE_LATEST
+from app.utils import metrics as prometheus_metrics
 import logging
 import asyncio
 
@@ -26,19 +31,42 @@ app.add_middleware(
 # Include API routes
 app.include_router(router)
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus metrics of this process, or of all processes in multiprocess mode; rendered only when scraped"""
+    return Response(prometheus_metrics.render(), media_type=CONTENT_TYPE_LATEST)
+
 # Create scheduler instance
-scheduler = RankingScheduler()
+scheduler = RankingScheduler(ranking_service)
 
 @app.on_event("startup")
 async def startup_event():
     # Initialize database
     await init_db()
+
+    if not settings.EMBEDDED_WORKER:
+        logging.info("Scraping is left to app.worker processes")
+        return
+
+    # Pre-warm Chrome drivers without blocking startup
+    asyncio.get_running_loop().run_in_executor(None, driver_pool.warm)
     
     # Start scheduler in background
     asyncio.create_task(scheduler.start())
     logging.info("Ranking scheduler started")
 
+    # Start the job runner; jobs lost by a previous process are claimed again once they time out
+    asyncio.create_task(job_service.run())
+    logging.info("Refresh job runner started")
+
 @app.on_event("shutdown")
 async def shutdown_event():
     scheduler.stop()
-    logging.info("Ranking scheduler stopped") 
\ No newline at end of file
+    logging.info("Ranking scheduler stopped")
+    job_service.stop()
+    logging.info("Refresh job runner stopped")
+    await shared_http_scraper.close()
+    scrape_executor.shutdown(wait=False)
+    driver_pool.close()
+    logging.info("Driver pool closed")
+    await engine.dispose() 
\ No newline at end of file
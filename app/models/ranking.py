@@ -1,7 +1,10 @@
-from sqlalchemy import Column, Integer, String, DateTime, Float, JSON, create_engine
+from sqlalchemy import Column, Integer, String, DateTime, Float, Boolean, JSON, Index, case, inspect, literal_column, select, text, true
+from sqlalchemy.dialects.postgresql import ARRAY, insert as pg_insert
 from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.orm import synonym
 from sqlalchemy.sql import func
-from app.config import settings
+from app.models.database import engine
+import logging
 
 Base = declarative_base()
 
@@ -12,10 +15,218 @@ class Ranking(Base):
     id = Column(Integer, primary_key=True)
     restaurant_slug = Column(String, nullable=False)
     rank = Column(Integer, nullable=False)
-    rating = Column(String, nullable=False)
+    rating = Column(Float)
     timestamp = Column(DateTime(timezone=True), server_default=func.now())
 
+    # In change-only storage a row covers every identical observation from `timestamp` to `last_seen`
+    last_seen = Column(DateTime(timezone=True))
+    observations = Column(Integer, nullable=False, server_default=text("1"))
+    valid_from = synonym("timestamp")
+
+    __table_args__ = (
+        Index("ix_rankings_slug_timestamp", restaurant_slug, timestamp.desc()),
+        Index("ix_rankings_timestamp", timestamp),  # Used by retention deletes
+    )
+
+class RankingRollupColumns:
+    """Columns shared by the pre-aggregated ranking tables"""
+    restaurant_slug = Column(String, primary_key=True)
+    bucket_start = Column(DateTime(timezone=True), primary_key=True)
+    samples = Column(Integer, nullable=False)
+    rank_sum = Column(Integer, nullable=False)
+    min_rank = Column(Integer, nullable=False)
+    max_rank = Column(Integer, nullable=False)
+    rating_samples = Column(Integer, nullable=False)
+    rating_sum = Column(Float, nullable=False)
+    min_rating = Column(Float)
+    max_rating = Column(Float)
+
+class HourlyRankingRollup(RankingRollupColumns, Base):
+    """Model for rankings aggregated per restaurant and hour"""
+    __tablename__ = "ranking_rollups_hourly"
+
+class DailyRankingRollup(RankingRollupColumns, Base):
+    """Model for rankings aggregated per restaurant and day"""
+    __tablename__ = "ranking_rollups_daily"
+
+class RestaurantLocation(Base):
+    """Model for caching a restaurant's delivery area"""
+    __tablename__ = "restaurant_locations"
+
+    restaurant_slug = Column(String, primary_key=True)
+    postal_code = Column(String, nullable=False)
+    city = Column(String, nullable=False)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+class ListingSnapshot(Base):
+    """Model for the complete ordered listing of a delivery area at one point in time"""
+    __tablename__ = "listing_snapshots"
+
+    id = Column(Integer, primary_key=True)
+    postal_code = Column(String, nullable=False)
+    city = Column(String, nullable=False)
+    scraped_at = Column(DateTime(timezone=True), server_default=func.now())
+    # Position i+1 of the listing is slugs[i] with ratings[i]; both are NULL where a card could not be read
+    slugs = Column(ARRAY(String), nullable=False)
+    ratings = Column(ARRAY(Float), nullable=False)
+
+    __table_args__ = (
+        Index("ix_listing_snapshots_area_scraped_at", postal_code, city, scraped_at.desc()),
+        Index("ix_listing_snapshots_slugs", slugs, postgresql_using="gin"),  # Finds the snapshots listing a slug
+    )
+
+class TrackedRestaurant(Base):
+    """Model for a restaurant the scheduler ranks periodically"""
+    __tablename__ = "tracked_restaurants"
+
+    restaurant_slug = Column(String, primary_key=True)
+    interval_minutes = Column(Integer)  # NULL uses SCRAPING_INTERVAL_MINUTES
+    priority = Column(Integer, nullable=False, default=0)  # Higher is claimed first when several are due
+    enabled = Column(Boolean, nullable=False, default=True)
+    next_run_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    # A scheduler holds a claimed restaurant until it reports back or the lease expires
+    lease_owner = Column(String)
+    lease_expires_at = Column(DateTime(timezone=True))
+    last_run_at = Column(DateTime(timezone=True))
+    last_status = Column(String)  # ok or not_found
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        Index("ix_tracked_restaurants_next_run_at", next_run_at),
+    )
+
+# Restaurants the scheduler tracked before the registry existed
+DEFAULT_TRACKED_RESTAURANTS = [
+    "loco-chicken-i-frechen",
+    "loco-chicken-bielefeld",
+    "happy-slice-pizza-i-wandsbek-markt",
+]
+
+class ScrapeJob(Base):
+    """Model for queued ranking refresh jobs"""
+    __tablename__ = "scrape_jobs"
+
+    id = Column(String, primary_key=True)
+    restaurant_slug = Column(String, nullable=False, index=True)
+    status = Column(String, nullable=False, default="queued")  # queued, running, done or failed
+    backend = Column(String)  # NULL uses SCRAPER_BACKEND
+    result = Column(JSON)
+    error = Column(String)
+    attempts = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    started_at = Column(DateTime(timezone=True))
+    finished_at = Column(DateTime(timezone=True))
+
+    __table_args__ = (
+        # At most one queued or running job per restaurant; duplicate requests attach to it
+        Index("ux_scrape_jobs_active_slug", restaurant_slug, unique=True,
+              postgresql_where=status.in_(("queued", "running"))),
+    )
+
+# Columns added to existing tables after they were first created
+ADDED_COLUMNS = {
+    'rankings': {
+        'last_seen': "TIMESTAMP WITH TIME ZONE",
+        'observations': "INTEGER NOT NULL DEFAULT 1",
+    },
+    'scrape_jobs': {
+        'backend': "VARCHAR",
+    },
+}
+
+def backfill_rollup(connection, rollup, granularity: str):
+    """Aggregate every stored raw ranking into a rollup table"""
+    # Change-only rows count once per observation, split evenly over the buckets from their first
+    # to their last sighting; the integer shares of a row add up to its observation count
+    buckets = func.generate_series(
+        func.date_trunc(granularity, Ranking.timestamp),
+        func.date_trunc(granularity, func.coalesce(Ranking.last_seen, Ranking.timestamp)),
+        literal_column(f"interval '1 {granularity}'"),
+    ).table_valued("bucket_start", with_ordinality="position").render_derived().lateral()
+    spanned = func.count().over(partition_by=Ranking.id)
+    spread = select(
+        Ranking.restaurant_slug,
+        Ranking.rank,
+        Ranking.rating,
+        buckets.c.bucket_start,
+        (Ranking.observations * buckets.c.position // spanned
+         - Ranking.observations * (buckets.c.position - 1) // spanned).label("samples"),
+    ).join(buckets, true()).subquery()
+    aggregates = select(
+        spread.c.restaurant_slug,
+        spread.c.bucket_start,
+        func.sum(spread.c.samples),
+        func.sum(spread.c.rank * spread.c.samples),
+        func.min(spread.c.rank),
+        func.max(spread.c.rank),
+        func.coalesce(func.sum(case((spread.c.rating.isnot(None), spread.c.samples), else_=0)), 0),
+        func.coalesce(func.sum(spread.c.rating * spread.c.samples), 0),
+        func.min(spread.c.rating),
+        func.max(spread.c.rating),
+    ).where(spread.c.samples > 0).group_by(spread.c.restaurant_slug, spread.c.bucket_start)
+    result = connection.execute(
+        pg_insert(rollup).from_select(
+            ['restaurant_slug', 'bucket_start', 'samples', 'rank_sum', 'min_rank', 'max_rank',
+             'rating_samples', 'rating_sum', 'min_rating', 'max_rating'],
+            aggregates
+        ).on_conflict_do_nothing()
+    )
+    logging.info(f"Backfilled {result.rowcount} rows into {rollup.__tablename__}")
+
+# Key of the advisory lock serializing schema changes of concurrently starting processes
+SCHEMA_LOCK_KEY = 7212030
+
+def create_schema(connection):
+    """Create missing tables and indexes and bring older tables up to date"""
+    # The API and workers start together; the second waits and then finds everything in place
+    connection.execute(text("SELECT pg_advisory_xact_lock(:key)"), {'key': SCHEMA_LOCK_KEY})
+    existing_tables = set(inspect(connection).get_table_names())
+    Base.metadata.create_all(connection)
+
+    if TrackedRestaurant.__tablename__ not in existing_tables:
+        logging.info(f"Seeding tracked_restaurants with {len(DEFAULT_TRACKED_RESTAURANTS)} restaurant(s)")
+        connection.execute(TrackedRestaurant.__table__.insert(), [
+            {'restaurant_slug': slug, 'priority': 0, 'enabled': True} for slug in DEFAULT_TRACKED_RESTAURANTS
+        ])
+
+    for table_name, added in ADDED_COLUMNS.items():
+        existing = {column['name'] for column in inspect(connection).get_columns(table_name)}
+        for column_name, ddl in added.items():
+            if column_name not in existing:
+                logging.info(f"Adding {table_name}.{column_name}")
+                connection.execute(text(f"ALTER TABLE {table_name} ADD COLUMN {column_name} {ddl}"))
+
+    # Older queues may hold duplicate active jobs, which the unique index on active jobs rejects
+    connection.execute(text(
+        "UPDATE scrape_jobs SET status = 'failed', error = 'Duplicate of an earlier active job', finished_at = now() "
+        "WHERE status IN ('queued', 'running') AND EXISTS ("
+        "SELECT 1 FROM scrape_jobs AS earlier WHERE earlier.restaurant_slug = scrape_jobs.restaurant_slug "
+        "AND earlier.status IN ('queued', 'running') "
+        "AND (earlier.created_at, earlier.id) < (scrape_jobs.created_at, scrape_jobs.id))"
+    ))
+
+    # create_all only creates indexes together with their table
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(connection, checkfirst=True)
+
+    # Tables created before ratings were stored as numbers have a VARCHAR NOT NULL rating column
+    columns = {column['name']: column for column in inspect(connection).get_columns('rankings')}
+    if not isinstance(columns['rating']['type'], Float):
+        logging.info("Converting rankings.rating to a nullable float column")
+        connection.execute(text(
+            "ALTER TABLE rankings "
+            "ALTER COLUMN rating TYPE DOUBLE PRECISION USING NULLIF(TRIM(rating::text), '')::double precision, "
+            "ALTER COLUMN rating DROP NOT NULL"
+        ))
+
+    # New rollup tables start out with the raw history, in the transaction that creates them, so
+    # retention never deletes raw rankings that no rollup holds
+    for rollup in (HourlyRankingRollup, DailyRankingRollup):
+        if rollup.__tablename__ not in existing_tables:
+            backfill_rollup(connection, rollup, "hour" if rollup is HourlyRankingRollup else "day")
+
 async def init_db():
     """Initialize database and create tables"""
-    engine = create_engine(settings.DATABASE_URL)
-    Base.metadata.create_all(engine) 
\ No newline at end of file
+    async with engine.begin() as conn:
+        await conn.run_sync(create_schema) 
\ No newline at end of file
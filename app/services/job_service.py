@@ -0,0 +1,194 @@
+from app.models.ranking import ScrapeJob
+from app.services.ranking_service import RankingService
+from app.config import settings
+from sqlalchemy import select, update, and_, or_, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from datetime import datetime, timedelta, timezone
+from typing import Optional, Dict
+import asyncio
+import logging
+import time
+import uuid
+
+ACTIVE_STATUSES = ("queued", "running")
+
+class JobService:
+    """Service for queueing ranking refreshes and running them in the background
+
+    Jobs are claimed with FOR UPDATE SKIP LOCKED, so runners in any number of processes can share
+    the queue. A job left running for longer than JOB_TIMEOUT_SECONDS is assumed lost with its
+    process and is claimed again, up to JOB_MAX_ATTEMPTS times.
+    """
+    def __init__(self, ranking_service: RankingService):
+        self.ranking_service = ranking_service
+        self.SessionLocal = ranking_service.SessionLocal
+        self.max_workers = settings.JOB_WORKERS
+        self.is_running = False
+        self._wakeup: Optional[asyncio.Event] = None
+
+    async def enqueue(self, restaurant_slug: str, backend: Optional[str] = None) -> Dict:
+        """Queue a refresh for a restaurant, or return the job already queued or running for it
+
+        The unique index on active jobs makes this safe across concurrent requests and processes.
+        """
+        async with self.SessionLocal() as session:
+            try:
+                while True:
+                    job = await session.scalar(
+                        pg_insert(ScrapeJob)
+                        .values(id=uuid.uuid4().hex, restaurant_slug=restaurant_slug, status="queued",
+                                backend=backend, attempts=0)
+                        .on_conflict_do_nothing(
+                            index_elements=[ScrapeJob.restaurant_slug],
+                            # A literal predicate, as bound parameters can't match the partial index in generic plans
+                            index_where=text("status IN ('queued', 'running')"),
+                        )
+                        .returning(ScrapeJob)
+                    )
+                    await session.commit()
+                    if job is not None:
+                        logging.info(f"Queued refresh job {job.id} for {restaurant_slug}")
+                        break
+                    job = await session.scalar(
+                        select(ScrapeJob)
+                        .where(ScrapeJob.restaurant_slug == restaurant_slug)
+                        .where(ScrapeJob.status.in_(ACTIVE_STATUSES))
+                    )
+                    if job is not None:
+                        logging.info(f"Attaching refresh request for {restaurant_slug} to job {job.id}")
+                        break
+                    # The active job finished in between; queue a new one
+                if self._wakeup:
+                    self._wakeup.set()
+                return self._to_dict(job)
+            except Exception:
+                await session.rollback()
+                raise
+
+    async def get_job(self, job_id: str) -> Optional[Dict]:
+        """Get a job's status and result"""
+        async with self.SessionLocal() as session:
+            job = await session.get(ScrapeJob, job_id)
+            return self._to_dict(job) if job else None
+
+    async def wait_for_result(self, restaurant_slug: str, backend: Optional[str] = None,
+                              timeout: float = None) -> Optional[Dict]:
+        """Queue a refresh and wait for whichever runner picks it up, returning its ranking
+
+        Raises asyncio.TimeoutError if the job does not finish within `timeout` seconds.
+        """
+        job = await self.enqueue(restaurant_slug, backend)
+        deadline = time.monotonic() + (timeout or settings.RANK_JOB_WAIT_SECONDS)
+        while job['status'] in ACTIVE_STATUSES:
+            if time.monotonic() >= deadline:
+                raise asyncio.TimeoutError(f"Refresh job {job['id']} for {restaurant_slug} did not finish in time")
+            await asyncio.sleep(0.5)
+            job = await self.get_job(job['id'])
+        return job['result']
+
+    async def run(self):
+        """Run queued jobs with up to `max_workers` at a time until stopped"""
+        self.is_running = True
+        self._wakeup = asyncio.Event()  # Created here so it belongs to the running loop
+        logging.info("Starting refresh job runner...")
+        await asyncio.gather(*(self._worker() for _ in range(self.max_workers)))
+
+    def stop(self):
+        """Stop the job runner"""
+        self.is_running = False
+        if self._wakeup:
+            self._wakeup.set()
+        logging.info("Stopping refresh job runner...")
+
+    async def _worker(self):
+        while self.is_running:
+            self._wakeup.clear()
+            try:
+                job = await self._claim_next()
+            except Exception as e:
+                logging.error(f"Error claiming refresh job: {str(e)}")
+                job = None
+
+            if job is None:
+                # Sleep until a job is enqueued, polling now and then for jobs added elsewhere
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=settings.JOB_POLL_INTERVAL_SECONDS)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            await self._execute(job)
+
+    async def _claim_next(self) -> Optional[Dict]:
+        now = datetime.now(timezone.utc)
+        lost = and_(ScrapeJob.status == "running", ScrapeJob.started_at < now - timedelta(seconds=settings.JOB_TIMEOUT_SECONDS))
+        async with self.SessionLocal() as session:
+            try:
+                result = await session.execute(
+                    update(ScrapeJob)
+                    .where(lost)
+                    .where(ScrapeJob.attempts >= settings.JOB_MAX_ATTEMPTS)
+                    .values(status="failed", error="Timed out", finished_at=now)
+                )
+                if result.rowcount:
+                    logging.warning(f"Gave up on {result.rowcount} refresh job(s) lost after {settings.JOB_MAX_ATTEMPTS} attempts")
+
+                # Rows another runner is claiming right now are skipped instead of waited on
+                job = await session.scalar(
+                    select(ScrapeJob)
+                    .where(or_(ScrapeJob.status == "queued", lost))
+                    .order_by(ScrapeJob.created_at)
+                    .limit(1)
+                    .with_for_update(skip_locked=True)
+                )
+                if job is None:
+                    await session.commit()
+                    return None
+                if job.status == "running":
+                    logging.warning(f"Reclaiming refresh job {job.id} lost since {job.started_at.isoformat()}")
+                job.status = "running"
+                job.started_at = now
+                job.attempts += 1
+                await session.commit()
+                return self._to_dict(job)
+            except Exception:
+                await session.rollback()
+                raise
+
+    async def _execute(self, job: Dict):
+        restaurant_slug = job['restaurant_slug']
+        logging.info(f"Running refresh job {job['id']} for {restaurant_slug}")
+        result, error = None, None
+        try:
+            result = await self.ranking_service.refresh_ranking(restaurant_slug, job['backend'])
+            if result is None:
+                error = "Restaurant not found or currently closed"
+        except Exception as e:
+            error = str(e)
+
+        async with self.SessionLocal() as session:
+            try:
+                row = await session.get(ScrapeJob, job['id'])
+                row.status = "done" if error is None else "failed"
+                row.result = result
+                row.error = error
+                row.finished_at = datetime.now(timezone.utc)
+                await session.commit()
+                logging.info(f"Refresh job {job['id']} {row.status}")
+            except Exception as e:
+                await session.rollback()
+                logging.error(f"Error finishing refresh job {job['id']}: {str(e)}")
+
+    def _to_dict(self, job: ScrapeJob) -> Dict:
+        return {
+            'id': job.id,
+            'restaurant_slug': job.restaurant_slug,
+            'status': job.status,
+            'backend': job.backend,
+            'result': job.result,
+            'error': job.error,
+            'attempts': job.attempts,
+            'created_at': job.created_at.isoformat() if job.created_at else None,
+            'started_at': job.started_at.isoformat() if job.started_at else None,
+            'finished_at': job.finished_at.isoformat() if job.finished_at else None,
+        }
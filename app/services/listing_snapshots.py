@@ -0,0 +1,70 @@
+from app.models.ranking import ListingSnapshot
+from sqlalchemy import select, insert, func, and_, exists
+from sqlalchemy.orm import aliased
+from datetime import datetime, timedelta, timezone
+from typing import Optional, Dict, List, Tuple
+import logging
+
+class ListingSnapshotStore:
+    """Complete area listings, one compact row per area and scrape"""
+    def __init__(self, session_factory):
+        self.SessionLocal = session_factory
+
+    async def save(self, listings: Dict[Tuple[str, str], List[Dict]]):
+        """Store the ordered slug/rating cards of each scraped area in one statement"""
+        rows = [{
+            'postal_code': postal_code,
+            'city': city,
+            'slugs': [card['slug'] for card in cards],
+            'ratings': [card['rating'] for card in cards],
+        } for (postal_code, city), cards in listings.items() if cards]
+        if not rows:
+            return
+        async with self.SessionLocal() as session:
+            try:
+                await session.execute(insert(ListingSnapshot), rows)
+                await session.commit()
+                logging.info(f"Stored listing snapshots of {len(rows)} area(s)")
+            except Exception as e:
+                await session.rollback()
+                logging.error(f"Error storing listing snapshots: {str(e)}")
+
+    async def find_rank(self, restaurant_slug: str, max_age_seconds: int) -> Optional[Dict]:
+        """Get a restaurant's rank and rating from the latest snapshot of its area, if scraped recently enough"""
+        newer = aliased(ListingSnapshot)
+        position = func.array_position(ListingSnapshot.slugs, restaurant_slug)
+        # Only the matching element is read back, not the whole listing
+        query = select(
+            ListingSnapshot.postal_code,
+            ListingSnapshot.city,
+            ListingSnapshot.scraped_at,
+            position.label('rank'),
+            ListingSnapshot.ratings[position].label('rating'),
+        )\
+            .where(ListingSnapshot.slugs.contains([restaurant_slug]))\
+            .where(ListingSnapshot.scraped_at >= datetime.now(timezone.utc) - timedelta(seconds=max_age_seconds))\
+            .where(~exists().where(and_(
+                # A newer listing of the same area without the restaurant means it dropped out
+                newer.postal_code == ListingSnapshot.postal_code,
+                newer.city == ListingSnapshot.city,
+                newer.scraped_at > ListingSnapshot.scraped_at,
+            )))\
+            .order_by(ListingSnapshot.scraped_at.desc())\
+            .limit(1)
+
+        async with self.SessionLocal() as session:
+            try:
+                row = (await session.execute(query)).first()
+            except Exception as e:
+                logging.error(f"Error reading listing snapshots: {str(e)}")
+                return None
+        if row is None:
+            return None
+        return {
+            'restaurant_slug': restaurant_slug,
+            'rank': row.rank,
+            'rating': row.rating,
+            'postal_code': row.postal_code,
+            'city': row.city,
+            'timestamp': row.scraped_at,
+        }
@@ -0,0 +1,84 @@
+from app.models.ranking import RestaurantLocation
+from app.config import settings
+from sqlalchemy import delete
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Optional, Tuple
+import logging
+
+class LocationCache:
+    """Restaurant location cache: an in-process LRU in front of the restaurant_locations table"""
+    def __init__(self, session_factory, ttl_hours: int = None, max_size: int = None):
+        self.SessionLocal = session_factory
+        self.ttl = timedelta(hours=ttl_hours or settings.LOCATION_CACHE_TTL_HOURS)
+        self.max_size = max_size or settings.LOCATION_CACHE_SIZE
+        self._lru: "OrderedDict[str, Tuple[Tuple[str, str], datetime]]" = OrderedDict()
+
+    async def get(self, restaurant_slug: str) -> Optional[Tuple[str, str]]:
+        """Get (postal_code, city) for a restaurant if it is cached and not expired"""
+        entry = self._lru.get(restaurant_slug)
+        if entry is not None:
+            location, updated_at = entry
+            if not self._is_expired(updated_at):
+                self._lru.move_to_end(restaurant_slug)
+                return location
+            del self._lru[restaurant_slug]
+
+        async with self.SessionLocal() as session:
+            try:
+                row = await session.get(RestaurantLocation, restaurant_slug)
+                if row is None or self._is_expired(row.updated_at):
+                    return None
+                location = (row.postal_code, row.city)
+                self._remember(restaurant_slug, location, row.updated_at)
+                logging.info(f"Location cache hit for {restaurant_slug}: {location[0]} {location[1]}")
+                return location
+            except Exception as e:
+                logging.error(f"Error reading cached location: {str(e)}")
+                return None
+
+    async def set(self, restaurant_slug: str, location: Tuple[str, str]):
+        """Store a restaurant's location"""
+        postal_code, city = location
+        now = datetime.now(timezone.utc)
+        async with self.SessionLocal() as session:
+            try:
+                row = await session.get(RestaurantLocation, restaurant_slug)
+                if row is None:
+                    row = RestaurantLocation(restaurant_slug=restaurant_slug)
+                    session.add(row)
+                row.postal_code = postal_code
+                row.city = city
+                row.updated_at = now
+                await session.commit()
+            except Exception as e:
+                await session.rollback()
+                logging.error(f"Error storing cached location: {str(e)}")
+        self._remember(restaurant_slug, location, now)
+
+    async def invalidate(self, restaurant_slug: str):
+        """Drop a restaurant's cached location"""
+        self._lru.pop(restaurant_slug, None)
+        async with self.SessionLocal() as session:
+            try:
+                await session.execute(
+                    delete(RestaurantLocation).where(RestaurantLocation.restaurant_slug == restaurant_slug)
+                )
+                await session.commit()
+                logging.info(f"Invalidated cached location for {restaurant_slug}")
+            except Exception as e:
+                await session.rollback()
+                logging.error(f"Error invalidating cached location: {str(e)}")
+
+    def _remember(self, restaurant_slug: str, location: Tuple[str, str], updated_at: datetime):
+        self._lru[restaurant_slug] = (location, updated_at)
+        self._lru.move_to_end(restaurant_slug)
+        while len(self._lru) > self.max_size:
+            self._lru.popitem(last=False)
+
+    def _is_expired(self, updated_at: Optional[datetime]) -> bool:
+        if updated_at is None:
+            return True
+        if updated_at.tzinfo is None:
+            updated_at = updated_at.replace(tzinfo=timezone.utc)
+        return datetime.now(timezone.utc) - updated_at > self.ttl
@@ -1,22 +1,46 @@
 from app.utils.scraper import LieferandoScraper
-from app.models.ranking import Ranking
-from sqlalchemy.orm import sessionmaker
-from sqlalchemy import create_engine
+from app.models.ranking import Ranking, HourlyRankingRollup, DailyRankingRollup, ListingSnapshot, TrackedRestaurant
+from app.services.location_cache import LocationCache
+from app.services.listing_snapshots import ListingSnapshotStore
+from app.models.database import SessionLocal
+from app.utils.metrics import FAILURES, span
+from sqlalchemy import select, delete, func, cast, literal, DateTime, Float
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from app.config import settings
-from typing import List, Optional, Dict
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional, Dict, Tuple
+import asyncio
 import logging
 
+BUCKETS = ("hour", "day", "week")
+ROLLUPS = ((HourlyRankingRollup, "hour"), (DailyRankingRollup, "day"))
+
+def _as_utc(value: datetime) -> datetime:
+    """Treat naive datetimes as UTC"""
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+def _observation_times(r: Ranking) -> List[datetime]:
+    """Times a row was actually observed: when it was first and last seen"""
+    if not r.last_seen or r.observations <= 1:
+        return [r.valid_from]
+    return [r.valid_from, r.last_seen]
+
 class RankingService:
     """Service for handling ranking operations"""
     def __init__(self):
-        self.scraper = LieferandoScraper()
-        self.engine = create_engine(settings.DATABASE_URL)
-        self.SessionLocal = sessionmaker(bind=self.engine)
+        self.SessionLocal = SessionLocal
+        self.location_cache = LocationCache(self.SessionLocal)
+        self.listing_snapshots = ListingSnapshotStore(self.SessionLocal)
+        self.scraper = LieferandoScraper(location_cache=self.location_cache, listing_store=self.listing_snapshots)
+        self._in_flight: Dict[str, asyncio.Task] = {}
+        # Set to a JobService when scrapes run in separate worker processes instead of this one
+        self.job_queue = None
 
-    async def get_current_ranking(self, restaurant_slug: str) -> Optional[Dict]:
+    async def get_current_ranking(self, restaurant_slug: str, backend: Optional[str] = None) -> Optional[Dict]:
         """Get current ranking for a restaurant"""
         try:
-            ranking_data = await self.scraper.get_ranking(restaurant_slug)
+            with span("ranking_service", "scrape"):
+                ranking_data = await self.scraper.get_ranking(restaurant_slug, backend=backend)
             if ranking_data:
                 logging.info(f"Got ranking for {restaurant_slug}: {ranking_data}")
                 # Store the ranking immediately when we get it
@@ -29,39 +53,333 @@ class RankingService:
             logging.error(f"Error getting ranking: {str(e)}")
             return None
 
-    async def get_ranking_history(self, restaurant_slug: str, limit: int = 100) -> List[dict]:
-        """Get ranking history for a restaurant"""
-        session = self.SessionLocal()
+    async def get_cached_ranking(self, restaurant_slug: str, max_age_seconds: int,
+                                 backend: Optional[str] = None) -> Tuple[Optional[Dict], str, float]:
+        """Get a ranking no older than max_age_seconds, returning (ranking, cache status, age in seconds)
+
+        Restaurants that are not tracked are also answered from a recent snapshot of their area's
+        listing. Stored rankings past max_age_seconds but within RANK_STALE_MAX_AGE_SECONDS are
+        returned right away while a refresh runs in the background. Concurrent scrapes of one slug
+        are coalesced.
+        """
+        with span("ranking_service", "cache_read"):
+            latest = await self.get_latest_ranking(restaurant_slug) if max_age_seconds > 0 else None
+        age = (datetime.now(timezone.utc) - latest['timestamp']).total_seconds() if latest else None
+        if latest is None or age > max_age_seconds:
+            with span("ranking_service", "snapshot_read"):
+                snapshot = await self.listing_snapshots.find_rank(restaurant_slug, max_age_seconds) if max_age_seconds > 0 else None
+            if snapshot:
+                ranking = {key: snapshot[key] for key in ('restaurant_slug', 'rank', 'rating')}
+                return ranking, "HIT", (datetime.now(timezone.utc) - snapshot['timestamp']).total_seconds()
+
+        if latest:
+            ranking = {key: latest[key] for key in ('restaurant_slug', 'rank', 'rating')}
+            if age <= max_age_seconds:
+                return ranking, "HIT", age
+            if age <= settings.RANK_STALE_MAX_AGE_SECONDS:
+                logging.info(f"Serving stale ranking for {restaurant_slug} ({age:.0f}s old) while refreshing")
+                self._scrape_once(restaurant_slug, backend)
+                return ranking, "STALE", age
+
+        ranking = await self.refresh_ranking(restaurant_slug, backend)
+        return ranking, "MISS", 0.0
+
+    async def refresh_ranking(self, restaurant_slug: str, backend: Optional[str] = None) -> Optional[Dict]:
+        """Scrape and store a ranking, joining a scrape of the same slug already in flight"""
+        return await asyncio.shield(self._scrape_once(restaurant_slug, backend))
+
+    def _scrape_once(self, restaurant_slug: str, backend: Optional[str] = None) -> asyncio.Task:
+        """Start a scrape for a slug, or join the one already in flight"""
+        task = self._in_flight.get(restaurant_slug)
+        if task is None:
+            if self.job_queue is not None:
+                scrape = self.job_queue.wait_for_result(restaurant_slug, backend)
+            else:
+                scrape = self.get_current_ranking(restaurant_slug, backend=backend)
+            task = asyncio.create_task(scrape)
+            self._in_flight[restaurant_slug] = task
+            task.add_done_callback(lambda done: self._scrape_done(restaurant_slug, done))
+        else:
+            logging.info(f"Joining in-flight scrape for {restaurant_slug}")
+        return task
+
+    def _scrape_done(self, restaurant_slug: str, task: asyncio.Task):
+        """Forget a finished scrape and log its failure, which stale refreshes leave unawaited"""
+        self._in_flight.pop(restaurant_slug, None)
+        if not task.cancelled() and task.exception() is not None:
+            e = task.exception()
+            logging.warning(f"Scrape of {restaurant_slug} failed: {type(e).__name__}: {str(e)}")
+
+    async def get_latest_ranking(self, restaurant_slug: str) -> Optional[Dict]:
+        """Get the most recently stored ranking for a restaurant"""
+        async with self.SessionLocal() as session:
+            try:
+                r = await session.scalar(
+                    select(Ranking)
+                    .where(Ranking.restaurant_slug == restaurant_slug)
+                    .order_by(Ranking.timestamp.desc())
+                    .limit(1)
+                )
+                if r is None:
+                    return None
+                return {
+                    'restaurant_slug': r.restaurant_slug,
+                    'rank': r.rank,
+                    'rating': r.rating,
+                    'timestamp': r.last_seen or r.timestamp
+                }
+            except Exception as e:
+                logging.error(f"Error reading latest ranking: {str(e)}")
+                return None
+
+    async def get_current_rankings(self, restaurant_slugs: List[str], concurrency: int = 1,
+                                   backend: Optional[str] = None) -> Dict[str, Optional[Dict]]:
+        """Get current rankings for several restaurants, scraping each delivery area once
+
+        This is the scheduler's batch path, so areas are also snapshotted in full; single lookups
+        stop scrolling as soon as their restaurant is found.
+        """
         try:
-            rankings = session.query(Ranking)\
-                .filter(Ranking.restaurant_slug == restaurant_slug)\
-                .order_by(Ranking.timestamp.desc())\
-                .limit(limit)\
-                .all()
-            
-            return [{
-                'restaurant_slug': r.restaurant_slug,
-                'rank': r.rank,
-                'rating': r.rating,
-                'timestamp': r.timestamp.isoformat()
-            } for r in rankings]
-        finally:
-            session.close()
+            with span("ranking_service", "scrape"):
+                rankings = await self.scraper.get_rankings(restaurant_slugs, concurrency=concurrency, backend=backend,
+                                                           collect_listings=True)
+        except Exception as e:
+            logging.error(f"Error getting rankings: {str(e)}")
+            return {slug: None for slug in restaurant_slugs}
+
+        for slug, ranking_data in rankings.items():
+            if ranking_data:
+                logging.info(f"Got ranking for {slug}: {ranking_data}")
+                await self.store_ranking(slug, ranking_data)
+            else:
+                logging.warning(f"No ranking data found for {slug}")
+        return rankings
+
+    @staticmethod
+    def history_bucket(bucket: Optional[str], start: Optional[datetime] = None,
+                       end: Optional[datetime] = None) -> Optional[str]:
+        """Cheapest granularity still retained for a history range: the requested one, or a coarser one
+
+        Raw rankings reaching past RAW_RANKING_RETENTION_DAYS are served as hourly buckets, and
+        hourly buckets reaching past HOURLY_ROLLUP_RETENTION_DAYS as daily ones.
+        """
+        bounds = [_as_utc(bound) for bound in (start, end) if bound]
+        if not bounds:
+            return bucket
+        oldest = min(bounds)
+        now = datetime.now(timezone.utc)
+
+        def expired(days: int) -> bool:
+            return days > 0 and oldest < now - timedelta(days=days)
+
+        if bucket is None and expired(settings.RAW_RANKING_RETENTION_DAYS):
+            bucket = "hour"
+        if bucket == "hour" and expired(settings.HOURLY_ROLLUP_RETENTION_DAYS):
+            bucket = "day"
+        return bucket
+
+    async def get_ranking_history(self, restaurant_slug: Optional[str] = None, limit: int = 100,
+                                  start: Optional[datetime] = None, end: Optional[datetime] = None,
+                                  before: Optional[datetime] = None) -> List[dict]:
+        """Get ranking history for a restaurant, or for all restaurants if no slug is given
+
+        Rankings are returned newest first within [start, end]. Pass the timestamp of the last
+        ranking of a page as `before` to get the next page. Rows written in change-only storage
+        are expanded back into one ranking per observation.
+        """
+        start = _as_utc(start) if start else None
+        end = _as_utc(end) if end else None
+        before = _as_utc(before) if before else None
+
+        row_end = func.coalesce(Ranking.last_seen, Ranking.timestamp)
+        query = select(Ranking)
+        if restaurant_slug:
+            # Rows of one restaurant never overlap, so start order is end order and can use the index
+            query = query.where(Ranking.restaurant_slug == restaurant_slug)\
+                .order_by(Ranking.timestamp.desc())
+        else:
+            query = query.order_by(row_end.desc())
+        if start:
+            query = query.where(row_end >= start)
+        if end:
+            query = query.where(Ranking.timestamp <= end)
+        if before:
+            query = query.where(Ranking.timestamp < before)
+
+        points = []
+        offset = 0
+        async with self.SessionLocal() as session:
+            while True:
+                rows = (await session.scalars(query.offset(offset).limit(limit))).all()
+                offset += len(rows)
+                for r in rows:
+                    for timestamp in _observation_times(r):
+                        if (start and timestamp < start) or (end and timestamp > end) or (before and timestamp >= before):
+                            continue
+                        points.append((timestamp, r))
+                points.sort(key=lambda point: point[0], reverse=True)
+
+                # Rows not fetched yet end no later than the last one fetched
+                if len(rows) < limit or (len(points) >= limit and points[limit - 1][0] >= (rows[-1].last_seen or rows[-1].timestamp)):
+                    break
+
+        return [{
+            'restaurant_slug': r.restaurant_slug,
+            'rank': r.rank,
+            'rating': r.rating,
+            'timestamp': timestamp.isoformat()
+        } for timestamp, r in points[:limit]]
+
+    async def get_ranking_buckets(self, restaurant_slug: str, bucket: str, limit: int = 100,
+                                  start: Optional[datetime] = None, end: Optional[datetime] = None,
+                                  before: Optional[datetime] = None) -> List[dict]:
+        """Get min/max/avg rank and rating per hour, day or week from the rollup tables
+
+        Hours come from the hourly rollup and days and weeks from the daily rollup. Buckets are
+        returned newest first; pass the start of the last bucket of a page as `before` to get the
+        next page.
+        """
+        if bucket not in BUCKETS:
+            raise ValueError(f"Unknown bucket: {bucket}")
+
+        rollup = HourlyRankingRollup if bucket == "hour" else DailyRankingRollup
+        bucket_start = rollup.bucket_start if bucket != "week" else func.date_trunc("week", rollup.bucket_start)
+        bucket_start = bucket_start.label('bucket_start')
+        samples = func.sum(rollup.samples)
+        rating_samples = func.sum(rollup.rating_samples)
+        query = select(
+            bucket_start,
+            samples.label('samples'),
+            func.min(rollup.min_rank).label('min_rank'),
+            func.max(rollup.max_rank).label('max_rank'),
+            (func.sum(rollup.rank_sum) / cast(samples, Float)).label('avg_rank'),
+            func.min(rollup.min_rating).label('min_rating'),
+            func.max(rollup.max_rating).label('max_rating'),
+            (func.sum(rollup.rating_sum) / func.nullif(rating_samples, 0)).label('avg_rating'),
+        ).where(rollup.restaurant_slug == restaurant_slug)\
+            .group_by(bucket_start)\
+            .order_by(bucket_start.desc())\
+            .limit(limit)
+        # Bounds select whole buckets: a bucket is included if it starts within [start, end]
+        if start:
+            query = query.where(rollup.bucket_start >= func.date_trunc(bucket, literal(_as_utc(start), DateTime(timezone=True))))
+        if end:
+            query = query.where(rollup.bucket_start <= _as_utc(end))
+        if before:
+            query = query.where(rollup.bucket_start < _as_utc(before))
+
+        async with self.SessionLocal() as session:
+            rows = (await session.execute(query)).all()
+
+        return [{
+            'restaurant_slug': restaurant_slug,
+            'bucket_start': row.bucket_start.isoformat(),
+            'samples': int(row.samples),
+            'min_rank': row.min_rank,
+            'max_rank': row.max_rank,
+            'avg_rank': float(row.avg_rank),
+            'min_rating': row.min_rating,
+            'max_rating': row.max_rating,
+            'avg_rating': float(row.avg_rating) if row.avg_rating is not None else None,
+        } for row in rows]
 
     async def store_ranking(self, restaurant_slug: str, ranking_data: Dict):
-        """Store ranking in database"""
-        session = self.SessionLocal()
-        try:
-            ranking = Ranking(
+        """Store ranking in database
+
+        In "changes" storage mode an observation identical to the restaurant's latest row only
+        bumps that row's last_seen and observation count instead of inserting a new row, unless
+        the row was last seen more than two scraping intervals ago.
+        """
+        rank = ranking_data['rank']
+        rating = ranking_data.get('rating')
+        with span("ranking_service", "db_write"):
+            async with self.SessionLocal() as session:
+                try:
+                    latest = None
+                    if settings.RANKING_STORAGE_MODE == "changes":
+                        latest = await session.scalar(
+                            select(Ranking)
+                            .where(Ranking.restaurant_slug == restaurant_slug)
+                            .order_by(Ranking.timestamp.desc())
+                            .limit(1)
+                            .with_for_update()
+                        )
+                        if latest is not None and (latest.rank != rank or latest.rating != rating):
+                            latest = None
+                        elif latest is not None:
+                            # A row must not paper over an outage in scraping
+                            interval = await session.scalar(
+                                select(TrackedRestaurant.interval_minutes)
+                                .where(TrackedRestaurant.restaurant_slug == restaurant_slug)
+                            ) or settings.SCRAPING_INTERVAL_MINUTES
+                            gap = datetime.now(timezone.utc) - _as_utc(latest.last_seen or latest.timestamp)
+                            if gap > timedelta(minutes=2 * interval):
+                                latest = None
+
+                    if latest is not None:
+                        latest.last_seen = func.now()
+                        latest.observations = Ranking.observations + 1
+                    else:
+                        session.add(Ranking(restaurant_slug=restaurant_slug, rank=rank, rating=rating))
+                    await self._add_to_rollups(session, restaurant_slug, rank, rating)
+                    await session.commit()
+                    logging.info(
+                        f"{'Extended' if latest is not None else 'Stored'} ranking for {restaurant_slug}: "
+                        f"rank={rank}, rating={rating}"
+                    )
+                except Exception as e:
+                    await session.rollback()
+                    FAILURES.labels("store_ranking").inc()
+                    logging.error(f"Error storing ranking: {str(e)}")
+
+    async def _add_to_rollups(self, session, restaurant_slug: str, rank: int, rating: Optional[float]):
+        """Fold one observation into its hourly and daily rollup rows"""
+        for rollup, granularity in ROLLUPS:
+            stmt = pg_insert(rollup).values(
                 restaurant_slug=restaurant_slug,
-                rank=ranking_data['rank'],
-                rating=ranking_data.get('rating')
+                bucket_start=func.date_trunc(granularity, func.now()),
+                samples=1,
+                rank_sum=rank,
+                min_rank=rank,
+                max_rank=rank,
+                rating_samples=0 if rating is None else 1,
+                rating_sum=rating or 0,
+                min_rating=rating,
+                max_rating=rating,
             )
-            session.add(ranking)
-            session.commit()
-            logging.info(f"Stored ranking for {restaurant_slug}: rank={ranking_data['rank']}, rating={ranking_data.get('rating')}")
-        except Exception as e:
-            session.rollback()
-            logging.error(f"Error storing ranking: {str(e)}")
-        finally:
-            session.close() 
\ No newline at end of file
+            await session.execute(stmt.on_conflict_do_update(
+                index_elements=[rollup.restaurant_slug, rollup.bucket_start],
+                set_={
+                    'samples': rollup.samples + stmt.excluded.samples,
+                    'rank_sum': rollup.rank_sum + stmt.excluded.rank_sum,
+                    'min_rank': func.least(rollup.min_rank, stmt.excluded.min_rank),
+                    'max_rank': func.greatest(rollup.max_rank, stmt.excluded.max_rank),
+                    'rating_samples': rollup.rating_samples + stmt.excluded.rating_samples,
+                    'rating_sum': rollup.rating_sum + stmt.excluded.rating_sum,
+                    # LEAST/GREATEST ignore NULLs, so missing ratings don't reset the range
+                    'min_rating': func.least(rollup.min_rating, stmt.excluded.min_rating),
+                    'max_rating': func.greatest(rollup.max_rating, stmt.excluded.max_rating),
+                }
+            ))
+
+    async def apply_retention(self):
+        """Delete raw rankings, hourly rollups and listing snapshots older than their retention period"""
+        now = datetime.now(timezone.utc)
+        policies = [
+            (Ranking, [Ranking.timestamp, func.coalesce(Ranking.last_seen, Ranking.timestamp)], settings.RAW_RANKING_RETENTION_DAYS),
+            (HourlyRankingRollup, [HourlyRankingRollup.bucket_start], settings.HOURLY_ROLLUP_RETENTION_DAYS),
+            (ListingSnapshot, [ListingSnapshot.scraped_at], settings.LISTING_SNAPSHOT_RETENTION_DAYS),
+        ]
+        async with self.SessionLocal() as session:
+            try:
+                for model, columns, days in policies:
+                    if days <= 0:
+                        continue  # Keep forever
+                    cutoff = now - timedelta(days=days)
+                    result = await session.execute(delete(model).where(*(column < cutoff for column in columns)))
+                    if result.rowcount:
+                        logging.info(f"Deleted {result.rowcount} rows older than {days} days from {model.__tablename__}")
+                await session.commit()
+            except Exception as e:
+                await session.rollback()
+                logging.error(f"Error applying retention: {str(e)}")
@@ -1,43 +1,31 @@
 import sys
 sys.path.append('.')
 
-from sqlalchemy import create_engine, text
-from app.config import settings
+from app.models.database import engine
+from app.models.ranking import Base, create_schema
+import asyncio
 import logging
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-def reset_database():
+async def reset_database():
     """Reset the database and create tables"""
-    engine = create_engine(settings.DATABASE_URL)
-    
     try:
-        # Drop existing table if it exists
-        with engine.connect() as conn:
-            conn.execute(text("DROP TABLE IF EXISTS rankings"))
-            conn.commit()
-            logger.info("Dropped existing rankings table")
-        
-        # Create new table with correct structure
-        create_table_sql = """
-        CREATE TABLE rankings (
-            id SERIAL PRIMARY KEY,
-            restaurant_slug VARCHAR(255) NOT NULL,
-            rank INTEGER NOT NULL,
-            rating FLOAT,
-            timestamp TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
-        )
-        """
-        
-        with engine.connect() as conn:
-            conn.execute(text(create_table_sql))
-            conn.commit()
-            logger.info("Created new rankings table")
+        async with engine.begin() as conn:
+            # Drop existing tables if they exist
+            await conn.run_sync(Base.metadata.drop_all)
+            logger.info("Dropped existing tables")
+
+            # Create tables and indexes from the models, the same schema init_db produces
+            await conn.run_sync(create_schema)
+            logger.info(f"Created tables: {', '.join(Base.metadata.tables)}")
             
     except Exception as e:
         logger.error(f"Error resetting database: {str(e)}")
         raise
+    finally:
+        await engine.dispose()
 
 if __name__ == "__main__":
-    reset_database()
\ No newline at end of file
+    asyncio.run(reset_database())
@@ -0,0 +1,170 @@
+from app.models.ranking import TrackedRestaurant
+from app.config import settings
+from sqlalchemy import select, update, func, or_, literal, Interval
+from sqlalchemy.exc import IntegrityError
+from datetime import timedelta
+from typing import Optional, Dict, List
+import logging
+
+class TrackingError(Exception):
+    """Raised when a tracked restaurant cannot be added or changed"""
+
+class TrackingService:
+    """Registry of tracked restaurants and lease-based distribution of due scrapes across schedulers"""
+    def __init__(self, session_factory):
+        self.SessionLocal = session_factory
+
+    @staticmethod
+    def _interval():
+        """Scrape interval of a row as a SQL interval"""
+        minutes = func.coalesce(TrackedRestaurant.interval_minutes, settings.SCRAPING_INTERVAL_MINUTES)
+        return minutes * literal(timedelta(minutes=1), Interval)
+
+    async def list(self) -> List[Dict]:
+        """Get every tracked restaurant, next due first"""
+        async with self.SessionLocal() as session:
+            rows = (await session.scalars(
+                select(TrackedRestaurant).order_by(TrackedRestaurant.next_run_at, TrackedRestaurant.restaurant_slug)
+            )).all()
+            return [self._to_dict(row) for row in rows]
+
+    async def get(self, restaurant_slug: str) -> Optional[Dict]:
+        """Get a tracked restaurant"""
+        async with self.SessionLocal() as session:
+            row = await session.get(TrackedRestaurant, restaurant_slug)
+            return self._to_dict(row) if row else None
+
+    async def add(self, restaurant_slug: str, interval_minutes: Optional[int] = None,
+                  priority: int = 0, enabled: bool = True) -> Dict:
+        """Start tracking a restaurant; it is due right away"""
+        async with self.SessionLocal() as session:
+            if await session.get(TrackedRestaurant, restaurant_slug) is not None:
+                raise TrackingError(f"{restaurant_slug} is already tracked")
+            row = TrackedRestaurant(
+                restaurant_slug=restaurant_slug,
+                interval_minutes=interval_minutes,
+                priority=priority,
+                enabled=enabled,
+            )
+            session.add(row)
+            try:
+                await session.commit()
+            except IntegrityError:
+                # Added concurrently since the check above
+                await session.rollback()
+                raise TrackingError(f"{restaurant_slug} is already tracked")
+            await session.refresh(row)
+            logging.info(f"Tracking {restaurant_slug}")
+            return self._to_dict(row)
+
+    async def update(self, restaurant_slug: str, **changes) -> Optional[Dict]:
+        """Change a tracked restaurant's interval, priority or enabled flag"""
+        async with self.SessionLocal() as session:
+            row = await session.get(TrackedRestaurant, restaurant_slug)
+            if row is None:
+                return None
+            for key in ('interval_minutes', 'priority', 'enabled'):
+                if key in changes:
+                    setattr(row, key, changes[key])
+            if 'interval_minutes' in changes:
+                # Reschedule from the last run with the new interval; restaurants never ranked stay due
+                await session.flush()
+                row.next_run_at = func.coalesce(TrackedRestaurant.last_run_at + self._interval(), TrackedRestaurant.next_run_at)
+            await session.commit()
+            await session.refresh(row)
+            return self._to_dict(row)
+
+    async def remove(self, restaurant_slug: str) -> bool:
+        """Stop tracking a restaurant; its stored rankings are kept"""
+        async with self.SessionLocal() as session:
+            row = await session.get(TrackedRestaurant, restaurant_slug)
+            if row is None:
+                return False
+            await session.delete(row)
+            await session.commit()
+            logging.info(f"Stopped tracking {restaurant_slug}")
+            return True
+
+    async def claim_due(self, owner: str, limit: int, lease_seconds: int) -> List[Dict]:
+        """Lease up to `limit` due restaurants to `owner`, highest priority and longest overdue first
+
+        Rows locked by another scheduler's claim are skipped rather than waited on, and rows leased
+        to another scheduler are left alone until the lease expires, so concurrent schedulers split
+        the due restaurants between them.
+        """
+        now = func.now()
+        due = select(TrackedRestaurant.restaurant_slug)\
+            .where(TrackedRestaurant.enabled.is_(True))\
+            .where(TrackedRestaurant.next_run_at <= now)\
+            .where(or_(TrackedRestaurant.lease_expires_at.is_(None), TrackedRestaurant.lease_expires_at < now))\
+            .order_by(TrackedRestaurant.priority.desc(), TrackedRestaurant.next_run_at)\
+            .limit(limit)\
+            .with_for_update(skip_locked=True)
+        async with self.SessionLocal() as session:
+            try:
+                rows = (await session.scalars(
+                    update(TrackedRestaurant)
+                    .where(TrackedRestaurant.restaurant_slug.in_(due.scalar_subquery()))
+                    .values(lease_owner=owner, lease_expires_at=now + literal(timedelta(seconds=lease_seconds), Interval))
+                    .returning(TrackedRestaurant)
+                    .execution_options(synchronize_session=False)
+                )).all()
+                await session.commit()
+            except Exception:
+                await session.rollback()
+                raise
+            rows = sorted(rows, key=lambda row: (-row.priority, row.next_run_at))
+            return [self._to_dict(row) for row in rows]
+
+    async def complete(self, owner: str, statuses: Dict[str, str]):
+        """Release leased restaurants and schedule their next run one interval from now"""
+        if not statuses:
+            return
+        async with self.SessionLocal() as session:
+            try:
+                for restaurant_slug, status in statuses.items():
+                    await session.execute(
+                        update(TrackedRestaurant)
+                        .where(TrackedRestaurant.restaurant_slug == restaurant_slug)
+                        .where(TrackedRestaurant.lease_owner == owner)
+                        .values(
+                            next_run_at=func.now() + self._interval(),
+                            last_run_at=func.now(),
+                            last_status=status,
+                            lease_owner=None,
+                            lease_expires_at=None,
+                        )
+                    )
+                await session.commit()
+            except Exception as e:
+                await session.rollback()
+                logging.error(f"Error completing tracked restaurants: {str(e)}")
+
+    async def seconds_until_next_due(self) -> Optional[float]:
+        """Seconds until the next enabled restaurant can be claimed, or None if nothing is tracked"""
+        # A leased restaurant becomes claimable again only once its lease expires
+        claimable_at = func.greatest(
+            TrackedRestaurant.next_run_at,
+            func.coalesce(TrackedRestaurant.lease_expires_at, TrackedRestaurant.next_run_at)
+        )
+        async with self.SessionLocal() as session:
+            next_run_at = await session.scalar(
+                select(func.min(claimable_at)).where(TrackedRestaurant.enabled.is_(True))
+            )
+            if next_run_at is None:
+                return None
+            now = await session.scalar(select(func.now()))
+            return max(0.0, (next_run_at - now).total_seconds())
+
+    def _to_dict(self, row: TrackedRestaurant) -> Dict:
+        return {
+            'restaurant_slug': row.restaurant_slug,
+            'interval_minutes': row.interval_minutes or settings.SCRAPING_INTERVAL_MINUTES,
+            'priority': row.priority,
+            'enabled': row.enabled,
+            'next_run_at': row.next_run_at.isoformat() if row.next_run_at else None,
+            'last_run_at': row.last_run_at.isoformat() if row.last_run_at else None,
+            'last_status': row.last_status,
+            'lease_owner': row.lease_owner,
+            'lease_expires_at': row.lease_expires_at.isoformat() if row.lease_expires_at else None,
+        }
@@ -2,7 +2,7 @@ import sys
 sys.path.append('.')  # Add project root to path
 
 from app.services.ranking_service import RankingService
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 import logging
 
 def format_rankings(rankings):
@@ -25,8 +25,16 @@ async def view_rankings(restaurant_slug: str = None, days: int = 7):
     """View rankings using the RankingService"""
     service = RankingService()
     try:
-        # Use the service method to get rankings
-        rankings = await service.get_ranking_history(restaurant_slug, limit=days * 24)  # Assuming hourly rankings
+        # Page through everything stored in the time range
+        start = datetime.now(timezone.utc) - timedelta(days=days)
+        rankings = []
+        cursor = None
+        while True:
+            page = await service.get_ranking_history(restaurant_slug, limit=500, start=start, before=cursor)
+            rankings.extend(page)
+            if len(page) < 500:
+                break
+            cursor = datetime.fromisoformat(page[-1]['timestamp'])
         if rankings:
             format_rankings(rankings)
         else:
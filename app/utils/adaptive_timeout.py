@@ -0,0 +1,19 @@
+class AdaptiveTimeout:
+    """Timeout that follows the observed duration of a wait, within fixed bounds"""
+
+    def __init__(self, initial: float, minimum: float, maximum: float,
+                 headroom: float = 3.0, smoothing: float = 0.3):
+        self.minimum = minimum
+        self.maximum = maximum
+        self.headroom = headroom  # Multiple of the typical wait allowed before giving up
+        self.smoothing = smoothing
+        self.estimate = initial / headroom  # Moving average of observed waits
+
+    @property
+    def timeout(self) -> float:
+        """Current timeout in seconds"""
+        return min(max(self.estimate * self.headroom, self.minimum), self.maximum)
+
+    def observe(self, duration: float):
+        """Record how long a wait actually took"""
+        self.estimate = self.smoothing * duration + (1 - self.smoothing) * self.estimate
@@ -0,0 +1,230 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional
+
+import psutil
+
+from app.utils.metrics import FAILURES, span
+
+
+def process_tree_memory_mb(pid: int) -> Optional[float]:
+    """Resident memory of a process and all its descendants, if it can be determined"""
+    try:
+        process = psutil.Process(pid)
+        processes = [process] + process.children(recursive=True)
+        rss = 0
+        for p in processes:
+            try:
+                rss += p.memory_info().rss
+            except psutil.Error:
+                continue
+        return rss / (1024 * 1024)
+    except psutil.Error:
+        return None
+
+
+class PooledDriver:
+    """A driver owned by the pool, together with its usage bookkeeping"""
+
+    def __init__(self, driver):
+        self.driver = driver
+        self.uses = 0
+        self.created_at = time.time()
+
+
+class DriverPool:
+    """Bounded pool of pre-warmed Chrome drivers with checkout/checkin and recycling"""
+
+    def __init__(self, factory: Callable, size: int, max_uses: int, max_memory_mb: int,
+                 checkout_timeout: float):
+        self.factory = factory
+        self.size = size
+        self.max_uses = max_uses
+        self.max_memory_mb = max_memory_mb
+        self.checkout_timeout = checkout_timeout
+
+        self._idle: List[PooledDriver] = []
+        self._in_use = 0
+        self._closed = False
+        self._cond = threading.Condition()
+        self._counters = {
+            'created': 0,
+            'recycled': 0,
+            'checkouts': 0,
+            'health_check_failures': 0,
+            'creation_failures': 0,
+        }
+        # Replaces recycled drivers off the request path; one thread, as warm() fills every free slot
+        self._refiller = ThreadPoolExecutor(max_workers=1, thread_name_prefix="driver-refill")
+
+    def warm(self):
+        """Start drivers until the pool is full"""
+        while True:
+            with self._cond:
+                if self._closed or len(self._idle) + self._in_use >= self.size:
+                    return
+                self._in_use += 1  # Reserve the slot while the driver starts
+
+            try:
+                pooled = self._new_driver()
+            except Exception as e:
+                logging.error(f"Error warming driver pool: {str(e)}")
+                with self._cond:
+                    self._in_use -= 1
+                    self._cond.notify()
+                return
+
+            with self._cond:
+                self._in_use -= 1
+                closed = self._closed
+                if not closed:
+                    self._idle.append(pooled)
+                self._cond.notify()
+            if closed:
+                self._quit(pooled)
+                return
+
+    def checkout(self) -> PooledDriver:
+        """Take a healthy driver from the pool, starting one if there is room"""
+        deadline = time.monotonic() + self.checkout_timeout
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise RuntimeError("Driver pool is closed")
+                if self._idle:
+                    pooled = self._idle.pop()
+                    break
+                if self._in_use < self.size:
+                    pooled = None
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise TimeoutError(f"No driver available after {self.checkout_timeout}s")
+                self._cond.wait(remaining)
+            self._in_use += 1
+            self._counters['checkouts'] += 1
+
+        try:
+            if pooled is not None and not self._is_healthy(pooled):
+                logging.warning("Pooled driver failed health check, replacing it")
+                self._count('health_check_failures')
+                self._quit(pooled)
+                pooled = None
+            if pooled is None:
+                pooled = self._new_driver()
+            return pooled
+        except Exception:
+            with self._cond:
+                self._in_use -= 1
+                self._cond.notify()
+            raise
+
+    def checkin(self, pooled: PooledDriver, discard: bool = False):
+        """Return a driver to the pool, recycling it if it is worn out"""
+        pooled.uses += 1
+        reason = None
+        if discard:
+            reason = "discarded after error"
+        elif pooled.uses >= self.max_uses:
+            reason = f"reached {pooled.uses} uses"
+        else:
+            memory_mb = self._memory_mb(pooled)
+            if memory_mb is not None and memory_mb > self.max_memory_mb:
+                reason = f"using {memory_mb:.0f} MB"
+
+        with self._cond:
+            if reason is None and self._closed:
+                reason = "pool closed"
+            if reason is None:
+                self._idle.append(pooled)
+            self._in_use -= 1
+            self._cond.notify()
+
+        if reason is not None:
+            logging.info(f"Recycling driver: {reason}")
+            self._count('recycled')
+            self._quit(pooled)
+            try:
+                self._refiller.submit(self.warm)
+            except RuntimeError:
+                pass  # The pool was closed meanwhile
+
+    @contextmanager
+    def driver(self):
+        """Context manager yielding a checked-out driver"""
+        with span("driver_pool", "checkout"):
+            pooled = self.checkout()
+        discard = False
+        try:
+            yield pooled.driver
+        except Exception:
+            discard = True
+            raise
+        finally:
+            self.checkin(pooled, discard=discard)
+
+    def stats(self) -> Dict:
+        """Current pool state and lifetime counters"""
+        with self._cond:
+            idle = list(self._idle)
+            in_use = self._in_use
+        return {
+            'size': self.size,
+            'idle': len(idle),
+            'in_use': in_use,
+            'max_uses': self.max_uses,
+            'max_memory_mb': self.max_memory_mb,
+            'idle_driver_uses': [p.uses for p in idle],
+            **self._counters,
+        }
+
+    def close(self):
+        """Quit all idle drivers; checked-out drivers are quit on checkin"""
+        with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._cond.notify_all()
+        for pooled in idle:
+            self._quit(pooled)
+        self._refiller.shutdown(wait=False)
+
+    def _new_driver(self) -> PooledDriver:
+        start = time.time()
+        try:
+            with span("driver_pool", "driver_start"):
+                driver = self.factory()
+        except Exception:
+            self._count('creation_failures')
+            FAILURES.labels("driver_start").inc()
+            raise
+        self._count('created')
+        logging.info(f"Started pooled driver in {time.time() - start:.1f}s")
+        return PooledDriver(driver)
+
+    def _count(self, counter: str):
+        # Scraper threads update counters concurrently
+        with self._cond:
+            self._counters[counter] += 1
+
+    def _is_healthy(self, pooled: PooledDriver) -> bool:
+        try:
+            return pooled.driver.execute_script("return 1") == 1
+        except Exception as e:
+            logging.warning(f"Driver health check failed: {str(e)}")
+            return False
+
+    def _memory_mb(self, pooled: PooledDriver) -> Optional[float]:
+        """Resident memory of the browser process tree, if it can be determined"""
+        pid = getattr(pooled.driver, 'browser_pid', None)
+        if not pid:
+            return None
+        return process_tree_memory_mb(pid)
+
+    def _quit(self, pooled: PooledDriver):
+        try:
+            pooled.driver.quit()
+        except Exception:
+            pass
@@ -0,0 +1,239 @@
+import aiohttp
+from bs4 import BeautifulSoup
+from app.config import settings
+from app.utils.rate_limiter import HostRateLimiter
+from app.utils.metrics import CARDS_SCANNED, FAILURES, span
+import asyncio
+import json
+import logging
+import re
+from typing import Optional, Dict, List, Tuple, Any
+from urllib.parse import urlparse
+
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
+
+POSTAL_CODE_PATTERN = re.compile(r'\b(\d{5})\b\s+(.+)')
+
+# Keys under which the page state may give the number of restaurants in an area
+TOTAL_COUNT_KEYS = ('totalCount', 'total', 'restaurantCount', 'count')
+
+
+def _slug_from_url(url: str) -> str:
+    return urlparse(url).path.rstrip('/').split('/')[-1]
+
+
+def _parse_rating(value: Any) -> Optional[float]:
+    """Parse a rating given as a number, a '4,5 (123)' string or a dict holding one of those"""
+    if isinstance(value, dict):
+        value = next((value[key] for key in ('starRating', 'score', 'ratingValue', 'average') if key in value), None)
+    if isinstance(value, (int, float)):
+        return float(value)
+    try:
+        return float(str(value).strip().split()[0].replace(',', '.'))
+    except (ValueError, IndexError):
+        return None
+
+
+def _next_data(soup: BeautifulSoup) -> Optional[Any]:
+    """Embedded Next.js page state, if present"""
+    script = soup.find('script', id='__NEXT_DATA__')
+    if not script or not script.string:
+        return None
+    try:
+        return json.loads(script.string)
+    except ValueError:
+        return None
+
+
+def _walk(data: Any):
+    """Yield every dict and list nested in a JSON document, depth first"""
+    if isinstance(data, dict):
+        yield data
+        for value in data.values():
+            yield from _walk(value)
+    elif isinstance(data, list):
+        yield data
+        for value in data:
+            yield from _walk(value)
+
+
+def _location_from_address_text(text: str) -> Optional[Tuple[str, str]]:
+    for line in text.split('\n'):
+        match = POSTAL_CODE_PATTERN.search(line.strip())
+        if match:
+            return (match.group(1), match.group(2).strip())
+    return None
+
+
+def parse_restaurant_location(html: str) -> Optional[Tuple[str, str]]:
+    """Get (postal_code, city) from a /speisekarte/{slug} page"""
+    soup = BeautifulSoup(html, 'html.parser')
+
+    # Structured data is the most stable source
+    for script in soup.find_all('script', type='application/ld+json'):
+        try:
+            data = json.loads(script.string or '')
+        except ValueError:
+            continue
+        for node in _walk(data):
+            address = node.get('address') if isinstance(node, dict) else None
+            if isinstance(address, dict) and address.get('postalCode') and address.get('addressLocality'):
+                return (str(address['postalCode']).strip(), str(address['addressLocality']).strip())
+
+    # Address element of the "Über uns" modal, when it is server-rendered
+    element = soup.select_one("[data-qa='restaurant-info-modal-info-address-element']")
+    if element:
+        location = _location_from_address_text(element.get_text('\n'))
+        if location:
+            return location
+
+    # Address embedded in the page state
+    data = _next_data(soup)
+    for node in _walk(data):
+        if isinstance(node, dict) and node.get('postalCode') and node.get('city'):
+            return (str(node['postalCode']).strip(), str(node['city']).strip())
+
+    return None
+
+
+def _is_restaurant_list(node: Any) -> bool:
+    return isinstance(node, list) and bool(node) and all(isinstance(item, dict) and 'uniqueName' in item for item in node)
+
+
+def _listing_total(data: Any) -> Optional[int]:
+    """Number of restaurants in the area, when the page state states it next to its restaurant list"""
+    for node in _walk(data):
+        if isinstance(node, dict) and any(_is_restaurant_list(value) for value in node.values()):
+            for key in TOTAL_COUNT_KEYS:
+                if isinstance(node.get(key), int) and not isinstance(node[key], bool):
+                    return node[key]
+    return None
+
+
+def parse_listing(html: str) -> Tuple[Optional[List[Dict]], bool]:
+    """Get the ordered restaurant cards of a /lieferservice/essen/{plz}-{city} page as slug/rating dicts
+
+    Also returns whether the cards are provably the complete listing: listings load more cards
+    while scrolling, so a page only counts as complete if its state gives a total count it meets.
+    """
+    soup = BeautifulSoup(html, 'html.parser')
+    data = _next_data(soup)
+    total = _listing_total(data)
+
+    container = soup.select_one("[data-qa='list-all-open-content']")
+    if container:
+        cards = []
+        for card in container.select("[data-qa='restaurant-card']"):
+            link = card.find('a', href=True)
+            rating = card.select_one("[data-qa='restaurant-ratings']")
+            cards.append({
+                'slug': _slug_from_url(link['href']) if link else None,
+                'rating': _parse_rating(rating.get_text(' ')) if rating else None,
+            })
+        if cards:
+            return cards, total is not None and len(cards) >= total
+
+    # Listing embedded in the page state: the first list of restaurants carrying a unique name
+    for node in _walk(data):
+        if _is_restaurant_list(node):
+            cards = [{
+                'slug': item['uniqueName'],
+                'rating': _parse_rating(item.get('rating')),
+            } for item in node]
+            return cards, total is not None and len(cards) >= total
+
+    return None, False
+
+
+class LieferandoHttpScraper:
+    """Lightweight scraper that fetches pages over HTTP and parses the server-rendered HTML"""
+
+    def __init__(self, base_url: str = None, rate_limiter: Optional[HostRateLimiter] = None):
+        self._base_url = base_url
+        self.rate_limiter = rate_limiter
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._session_lock = asyncio.Lock()
+
+    @property
+    def base_url(self) -> str:
+        """Site to scrape; follows BASE_LIEFERANDO_URL unless set explicitly"""
+        return self._base_url or settings.BASE_LIEFERANDO_URL
+
+    async def _get_session(self) -> aiohttp.ClientSession:
+        async with self._session_lock:
+            if self._session is None or self._session.closed:
+                self._session = aiohttp.ClientSession(
+                    connector=aiohttp.TCPConnector(limit=settings.HTTP_SCRAPER_MAX_CONNECTIONS),
+                    timeout=aiohttp.ClientTimeout(total=settings.HTTP_SCRAPER_TIMEOUT_SECONDS),
+                    headers={'User-Agent': USER_AGENT, 'Accept-Language': 'de-DE,de;q=0.9'},
+                )
+            return self._session
+
+    async def _fetch(self, url: str) -> Optional[str]:
+        if self.rate_limiter:
+            with span("http", "rate_limit_wait"):
+                await self.rate_limiter.acquire_async(url)
+        session = await self._get_session()
+        try:
+            with span("http", "fetch"):
+                async with session.get(url) as response:
+                    if response.status != 200:
+                        FAILURES.labels("http_fetch").inc()
+                        logging.warning(f"HTTP {response.status} for {url}")
+                        return None
+                    return await response.text()
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            FAILURES.labels("http_fetch").inc()
+            logging.warning(f"Error fetching {url}: {str(e)}")
+            return None
+
+    async def get_restaurant_location(self, restaurant_id: str) -> Optional[Tuple[str, str]]:
+        """Get restaurant's location (postal code and city) from its menu page"""
+        html = await self._fetch(f"{self.base_url}/speisekarte/{restaurant_id}")
+        if html is None:
+            return None
+        # Pages can be megabytes; parsing them on the event loop would stall every other request
+        with span("http", "location_parse"):
+            location = await asyncio.get_running_loop().run_in_executor(None, parse_restaurant_location, html)
+        if location:
+            logging.info(f"Got location over HTTP for {restaurant_id}: {location[0]} {location[1]}")
+        return location
+
+    async def get_listing(self, postal_code: str, city: str) -> Tuple[Optional[List[Dict]], bool]:
+        """Get the ordered listing of an area and whether it is provably complete"""
+        html = await self._fetch(f"{self.base_url}/lieferservice/essen/{postal_code}-{city.lower()}")
+        if html is None:
+            return None, False
+        with span("http", "listing_parse"):
+            listing, complete = await asyncio.get_running_loop().run_in_executor(None, parse_listing, html)
+        if listing:
+            CARDS_SCANNED.labels("http").inc(len(listing))
+            logging.info(
+                f"Parsed {len(listing)} restaurants over HTTP in {postal_code} {city}"
+                f"{'' if complete else ' (possibly partial)'}"
+            )
+        return listing, complete
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Parse a saved Lieferando page')
+    parser.add_argument('kind', choices=['menu', 'listing'], help='Type of page')
+    parser.add_argument('path', help='Path to the saved HTML file')
+
+    args = parser.parse_args()
+
+    with open(args.path, encoding='utf-8') as f:
+        page = f.read()
+    if args.kind == 'menu':
+        print(parse_restaurant_location(page))
+    else:
+        cards, complete = parse_listing(page)
+        for position, card in enumerate(cards or [], 1):
+            print(f"{position:<5} {card['slug']:<50} {card['rating']}")
+        print(f"{'Complete' if complete else 'Possibly partial'} listing")
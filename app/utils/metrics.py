@@ -0,0 +1,82 @@
+from prometheus_client import CollectorRegistry, Counter, Histogram, REGISTRY, generate_latest, multiprocess, values
+from contextlib import contextmanager
+import os
+import socket
+import time
+
+# Metrics live in the default registry of each process and are only rendered when /metrics is read.
+# With PROMETHEUS_MULTIPROC_DIR set, every process instead writes them to files in that directory
+# and /metrics adds up the files of all processes, including scraper workers in other containers.
+MULTIPROCESS = bool(os.environ.get('PROMETHEUS_MULTIPROC_DIR'))
+
+if MULTIPROCESS:
+    # Files are named after the process; pids alone repeat across containers sharing the directory
+    values.ValueClass = values.MultiProcessValue(
+        lambda: f"{socket.gethostname().replace('_', '-')}-{os.getpid()}"
+    )
+
+PHASE_SECONDS = Histogram(
+    'lanch_phase_duration_seconds',
+    'Time spent in each phase of scraping and storing rankings',
+    ['component', 'phase'],
+    buckets=(0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120, 300),
+)
+
+CARDS_SCANNED = Counter(
+    'lanch_scraper_cards_scanned_total',
+    'Listing cards read while searching for restaurants',
+    ['backend'],
+)
+
+SCROLL_ITERATIONS = Counter(
+    'lanch_scraper_scroll_iterations_total',
+    'Times a listing was scrolled to load more cards',
+)
+
+RETRIES = Counter(
+    'lanch_scraper_retries_total',
+    'Scraping steps that were attempted again',
+    ['operation'],
+)
+
+FAILURES = Counter(
+    'lanch_failures_total',
+    'Scraping and storage steps that failed',
+    ['operation'],
+)
+
+SCHEDULER_CYCLE_SECONDS = Histogram(
+    'lanch_scheduler_cycle_duration_seconds',
+    'Duration of scheduler cycles, from claiming due restaurants to storing their rankings',
+    buckets=(1, 5, 10, 30, 60, 120, 300, 600, 1200, 1800, 3600),
+)
+
+SCHEDULER_RESTAURANTS = Counter(
+    'lanch_scheduler_restaurants_total',
+    'Tracked restaurants ranked by the scheduler',
+    ['status'],
+)
+
+SCHEDULER_MISSED_DEADLINES = Counter(
+    'lanch_scheduler_missed_deadlines_total',
+    'Tracked restaurants claimed more than one interval after they fell due',
+)
+
+
+@contextmanager
+def span(component: str, phase: str):
+    """Time a block into lanch_phase_duration_seconds, whether or not it raises"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        PHASE_SECONDS.labels(component, phase).observe(time.perf_counter() - start)
+
+
+def render() -> bytes:
+    """Current metrics in the Prometheus text format, of every process in multiprocess mode"""
+    if not MULTIPROCESS:
+        return generate_latest(REGISTRY)
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return generate_latest(registry)
@@ -0,0 +1,73 @@
+import asyncio
+import threading
+import time
+from typing import Dict
+from urllib.parse import urlparse
+
+
+class TokenBucket:
+    """Thread-safe token bucket allowing `rate` requests per second with bursts up to `capacity`"""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def try_acquire(self) -> float:
+        """Take a token if one is available, returning 0, or else the delay until the next one"""
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+            self.updated_at = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return 0.0
+            return (1 - self.tokens) / self.rate
+
+    def acquire(self) -> float:
+        """Block until a token is available, returning how long it waited"""
+        waited = 0.0
+        while True:
+            delay = self.try_acquire()
+            if delay == 0:
+                return waited
+            time.sleep(delay)
+            waited += delay
+
+    async def acquire_async(self) -> float:
+        """Wait without blocking the event loop until a token is available, returning how long it waited"""
+        waited = 0.0
+        while True:
+            delay = self.try_acquire()
+            if delay == 0:
+                return waited
+            await asyncio.sleep(delay)
+            waited += delay
+
+
+class HostRateLimiter:
+    """One token bucket per host, shared by every scraper thread and coroutine"""
+
+    def __init__(self, requests_per_minute: float, burst: int):
+        self.rate = requests_per_minute / 60
+        self.burst = burst
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, url: str) -> float:
+        """Block until a request to the URL's host is allowed, returning how long it waited"""
+        return self._bucket(url).acquire()
+
+    async def acquire_async(self, url: str) -> float:
+        """Wait until a request to the URL's host is allowed, returning how long it waited"""
+        return await self._bucket(url).acquire_async()
+
+    def _bucket(self, url: str) -> TokenBucket:
+        host = urlparse(url).netloc
+        with self._lock:
+            bucket = self._buckets.get(host)
+            if bucket is None:
+                bucket = self._buckets[host] = TokenBucket(self.rate, self.burst)
+        return bucket
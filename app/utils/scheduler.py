@@ -1,65 +1,126 @@
 import asyncio
 import logging
-from datetime import datetime
-from typing import List
+import os
+import socket
+import uuid
+from datetime import datetime, timezone
+from typing import Optional
 from app.services.ranking_service import RankingService
+from app.services.tracking_service import TrackingService
+from app.config import settings
+from app.utils.metrics import SCHEDULER_CYCLE_SECONDS, SCHEDULER_MISSED_DEADLINES, SCHEDULER_RESTAURANTS
 import time
 
 class RankingScheduler:
-    def __init__(self):
-        self.ranking_service = RankingService()
-        self.restaurant_slugs = [
-            "loco-chicken-i-frechen",
-            "loco-chicken-bielefeld",
-            #"happy-slice-suedstadt",
-            "happy-slice-pizza-i-wandsbek-markt",
-            # Add more restaurants as needed
-        ]
-        self.interval_minutes = 60
+    """Ranks tracked restaurants as they fall due, sharing the work with any other running schedulers"""
+    def __init__(self, ranking_service: Optional[RankingService] = None):
+        self.ranking_service = ranking_service or RankingService()
+        self.tracking_service = TrackingService(self.ranking_service.SessionLocal)
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.interval_minutes = settings.SCRAPING_INTERVAL_MINUTES
+        self.max_workers = settings.SCHEDULER_WORKERS
+        self.batch_size = settings.SCHEDULER_BATCH_SIZE
         self.is_running = False
-        
+        self.missed_deadlines = 0
+        self.last_cycle = None
+        self._last_retention = 0.0
+        self._wakeup: Optional[asyncio.Event] = None
+
     async def start(self):
         """Start the scheduler"""
         self.is_running = True
-        logging.info("Starting ranking scheduler...")
-        
+        self._wakeup = asyncio.Event()  # Created here so it belongs to the running loop
+        logging.info(f"Starting ranking scheduler {self.owner}...")
+
         while self.is_running:
-            start_time = time.time()
-            
+            ranked = 0
             try:
-                await self.update_all_rankings()
+                ranked = await self.update_all_rankings()
+                # Retention is idempotent, so it does not matter if several schedulers run it
+                if time.time() - self._last_retention > self.interval_minutes * 60:
+                    await self.ranking_service.apply_retention()
+                    self._last_retention = time.time()
             except Exception as e:
                 logging.error(f"Error in scheduler loop: {e}")
-            
-            # Calculate sleep time
-            elapsed_time = time.time() - start_time
-            sleep_time = max(0, (self.interval_minutes * 60) - elapsed_time)
-            
-            logging.info(f"Scheduler sleeping for {sleep_time/60:.2f} minutes")
-            await asyncio.sleep(sleep_time)
-    
-    async def update_all_rankings(self):
-        """Update rankings for all restaurants"""
-        logging.info(f"Updating rankings at {datetime.now()}")
-        
-        for slug in self.restaurant_slugs:
+
+            if ranked:
+                continue  # More restaurants may have fallen due meanwhile
+
             try:
-                logging.info(f"Fetching ranking for {slug}")
-                ranking_data = await self.ranking_service.get_current_ranking(slug)
-                
-                if ranking_data:
-                    logging.info(f"Successfully updated ranking for {slug}")
-                else:
-                    logging.warning(f"No ranking data found for {slug}")
-                
-                # Add small delay between requests to avoid overwhelming the target site
-                await asyncio.sleep(5)
-                
+                next_due = await self.tracking_service.seconds_until_next_due()
             except Exception as e:
-                logging.error(f"Error updating ranking for {slug}: {e}")
-                continue
-    
+                logging.error(f"Error reading next due restaurant: {e}")
+                next_due = None
+            # Poll now and then for restaurants added or claimable elsewhere
+            sleep_time = min(next_due if next_due is not None else settings.SCHEDULER_POLL_SECONDS,
+                             settings.SCHEDULER_POLL_SECONDS)
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=max(sleep_time, 1))
+            except asyncio.TimeoutError:
+                pass
+
+    async def update_all_rankings(self) -> int:
+        """Claim due restaurants and rank them, scraping up to `max_workers` delivery areas at once
+
+        Returns how many restaurants were claimed.
+        """
+        claimed = await self.tracking_service.claim_due(
+            self.owner, self.batch_size, settings.SCHEDULER_LEASE_SECONDS
+        )
+        if not claimed:
+            return 0
+
+        slugs = [restaurant['restaurant_slug'] for restaurant in claimed]
+        logging.info(f"Updating rankings of {len(slugs)} due restaurant(s) at {datetime.now()}")
+        start_time = time.time()
+
+        # A restaurant more than one interval overdue missed a run
+        now = datetime.now(timezone.utc)
+        missed = sum(
+            1 for restaurant in claimed
+            if (now - datetime.fromisoformat(restaurant['next_run_at'])).total_seconds() > restaurant['interval_minutes'] * 60
+        )
+        if missed:
+            SCHEDULER_MISSED_DEADLINES.inc(missed)
+            self.missed_deadlines += missed
+            logging.warning(
+                f"{missed} restaurant(s) were overdue by more than their interval "
+                f"({self.missed_deadlines} missed deadlines so far)"
+            )
+
+        try:
+            rankings = await self.ranking_service.get_current_rankings(slugs, concurrency=self.max_workers)
+        except Exception as e:
+            logging.error(f"Error updating rankings: {e}")
+            rankings = {slug: None for slug in slugs}
+
+        for slug, ranking_data in rankings.items():
+            if ranking_data:
+                logging.info(f"Successfully updated ranking for {slug}")
+            else:
+                logging.warning(f"No ranking data found for {slug}")
+
+        statuses = {slug: "ok" if rankings.get(slug) else "not_found" for slug in slugs}
+        await self.tracking_service.complete(self.owner, statuses)
+        for status in statuses.values():
+            SCHEDULER_RESTAURANTS.labels(status).inc()
+
+        duration = time.time() - start_time
+        SCHEDULER_CYCLE_SECONDS.observe(duration)
+        succeeded = sum(1 for ranking_data in rankings.values() if ranking_data)
+        self.last_cycle = {
+            'started_at': datetime.fromtimestamp(start_time).isoformat(),
+            'duration_seconds': round(duration, 1),
+            'restaurants': len(slugs),
+            'succeeded': succeeded,
+            'missed_deadlines': self.missed_deadlines,
+        }
+        logging.info(f"Ranking cycle finished in {duration:.1f}s: {succeeded}/{len(slugs)} restaurants ranked")
+        return len(slugs)
+
     def stop(self):
         """Stop the scheduler"""
         self.is_running = False
-        logging.info("Stopping ranking scheduler...") 
\ No newline at end of file
+        if self._wakeup:
+            self._wakeup.set()
+        logging.info("Stopping ranking scheduler...")
\ No newline at end of file
@@ -3,21 +3,91 @@ from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.common.exceptions import TimeoutException, NoSuchElementException
+import asyncio
 import logging
 import time
-from typing import Optional, Dict, Tuple
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Dict, Tuple, List, Iterable
+from urllib.parse import urlparse
+from app.config import settings
+from app.utils.driver_pool import DriverPool
+from app.utils.adaptive_timeout import AdaptiveTimeout
+from app.utils.rate_limiter import HostRateLimiter
+from app.utils.http_scraper import LieferandoHttpScraper
+from app.utils.metrics import CARDS_SCANNED, FAILURES, RETRIES, SCROLL_ITERATIONS, span
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
+# Returns position, href and rating text of every listing card after the first `arguments[0]` ones
+EXTRACT_CARDS_SCRIPT = """
+const container = document.querySelector("[data-qa='list-all-open-content']");
+if (!container) { return null; }
+const cards = container.querySelectorAll("[data-qa='restaurant-card']");
+const result = [];
+for (let i = arguments[0]; i < cards.length; i++) {
+    const link = cards[i].querySelector('a');
+    const rating = cards[i].querySelector("[data-qa='restaurant-ratings']");
+    result.push({
+        position: i + 1,
+        href: link ? link.href : null,
+        rating: rating ? rating.innerText : null
+    });
+}
+return result;
+"""
+
+# Images, fonts and media, not needed to read card order, links and ratings
+LEAN_BLOCKED_EXTENSIONS = [
+    'png', 'jpg', 'jpeg', 'gif', 'webp', 'avif', 'svg', 'ico',
+    'woff', 'woff2', 'ttf', 'otf', 'eot', 'mp4', 'webm',
+]
+
+# Requests blocked in lean mode; CDN assets often carry query strings such as logo.png?w=200
+LEAN_BLOCKED_URLS = [
+    pattern
+    for extension in LEAN_BLOCKED_EXTENSIONS
+    for pattern in (f'*.{extension}', f'*.{extension}?*')
+] + [
+    # Analytics, tag managers, ads and session recording
+    '*googletagmanager.com*', '*google-analytics.com*', '*doubleclick.net*', '*googlesyndication.com*',
+    '*googleadservices.com*', '*facebook.net*', '*facebook.com/tr*', '*connect.facebook.net*',
+    '*hotjar.com*', '*optimizely.com*', '*bing.com*', '*criteo.*', '*taboola.com*', '*tiktok.com*',
+    '*snapchat.com*', '*pinterest.com*', '*adsrvr.org*', '*newrelic.com*', '*nr-data.net*',
+    '*datadoghq*', '*sentry.io*', '*braze.com*', '*appsflyer.com*', '*branch.io*',
+]
+
+CARD_COUNT_SCRIPT = "return document.querySelectorAll(\"[data-qa='list-all-open-content'] [data-qa='restaurant-card']\").length;"
+
 class LieferandoScraper:
     """Scraper for Lieferando rankings"""
     
-    def __init__(self):
-        self.base_url = "https://www.lieferando.de"
+    def __init__(self, pool: Optional[DriverPool] = None, location_cache=None,
+                 http_scraper: Optional[LieferandoHttpScraper] = None, listing_store=None,
+                 rate_limiter: Optional[HostRateLimiter] = None, base_url: Optional[str] = None):
+        self._base_url = base_url
         self.known_chains = ['loco-chicken', 'happy-slice', 'happy-slice-pizza']
+        self.pool = pool or driver_pool
+        self.rate_limiter = rate_limiter or shared_rate_limiter
+        self.http_scraper = http_scraper or shared_http_scraper
+        self.location_cache = location_cache
+        self.listing_store = listing_store if settings.LISTING_SNAPSHOTS else None
+        self.bulk_extraction = settings.SCRAPER_BULK_EXTRACTION
+
+        # Timeouts adapt to how long each kind of wait has been taking
+        self.menu_page_timeout = AdaptiveTimeout(initial=10, minimum=5, maximum=30)
+        self.info_modal_timeout = AdaptiveTimeout(initial=5, minimum=2, maximum=15)
+        self.listing_timeout = AdaptiveTimeout(initial=10, minimum=5, maximum=30)
+        # Listings sometimes stall for seconds between batches, so the quiet period never drops below 3s
+        self.scroll_timeout = AdaptiveTimeout(initial=3, minimum=3, maximum=10)
+
+    @property
+    def base_url(self) -> str:
+        """Site to scrape; follows BASE_LIEFERANDO_URL unless set explicitly"""
+        return self._base_url or settings.BASE_LIEFERANDO_URL
 
-    def _create_driver(self):
+    @staticmethod
+    def _chrome_options(lean: bool):
         options = uc.ChromeOptions()
         options.add_argument('--no-sandbox')
         options.add_argument('--headless=new')
@@ -27,35 +97,117 @@ class LieferandoScraper:
         options.add_argument('--enable-javascript')
         options.add_argument('--disable-blink-features=AutomationControlled')
         options.add_argument('--user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36')
-        
+
+        if lean:
+            # Return from get() once the DOM is parsed; every read waits for its elements anyway
+            options.page_load_strategy = 'eager'
+            options.add_argument('--blink-settings=imagesEnabled=false')
+            options.add_argument('--disable-extensions')
+            options.add_argument('--disable-background-networking')
+            options.add_argument('--disable-component-update')
+            options.add_argument('--disable-default-apps')
+            options.add_argument('--disable-sync')
+            options.add_argument('--mute-audio')
+            options.add_argument('--no-first-run')
+            options.add_argument('--disable-features=Translate,MediaRouter,OptimizationHints,AutofillServerCommunication')
+            options.add_argument('--renderer-process-limit=2')
+            options.add_argument('--disk-cache-size=33554432')
+            options.add_argument(f'--js-flags=--max-old-space-size={settings.SCRAPER_LEAN_JS_HEAP_MB}')
+        return options
+
+    @staticmethod
+    def _create_driver(lean: Optional[bool] = None, options=None):
+        """Start a Chrome driver, in lean mode unless SCRAPER_LEAN_MODE is off"""
+        lean = settings.SCRAPER_LEAN_MODE if lean is None else lean
+        options = options or LieferandoScraper._chrome_options(lean)
+
         try:
             driver = uc.Chrome(options=options, version_main=132, headless=True)
             driver.set_page_load_timeout(30)
+            if lean:
+                driver.execute_cdp_cmd('Network.enable', {})
+                driver.execute_cdp_cmd('Network.setBlockedURLs', {'urls': LEAN_BLOCKED_URLS})
             return driver
         except Exception as e:
             logging.error(f"Error creating driver: {str(e)}")
             raise
 
-    async def _get_restaurant_location(self, driver, restaurant_id: str, max_retries: int = 3) -> Optional[Tuple[str, str]]:
+    def _load_page(self, driver, url: str):
+        """Load a page once the per-host rate limit allows it"""
+        with span("selenium", "rate_limit_wait"):
+            waited = self.rate_limiter.acquire(url)
+        if waited > 0:
+            logging.info(f"Rate limiter held request for {waited:.1f}s")
+        with span("selenium", "page_load"):
+            driver.get(url)
+
+    def _wait_for(self, driver, adaptive_timeout: AdaptiveTimeout, condition, description: str,
+                  scale: float = 1.0, observe_timeout: bool = True):
+        """Wait for a condition, logging how long it took and feeding that back into the timeout"""
+        timeout = adaptive_timeout.timeout * scale
+        start = time.monotonic()
+        try:
+            result = WebDriverWait(driver, timeout, poll_frequency=0.25).until(condition)
+        except TimeoutException:
+            if observe_timeout:
+                adaptive_timeout.observe(timeout)
+            logging.info(f"Gave up waiting for {description} after {time.monotonic() - start:.1f}s")
+            raise
+        waited = time.monotonic() - start
+        adaptive_timeout.observe(waited)
+        logging.info(f"Waited {waited:.1f}s for {description} (timeout {timeout:.1f}s)")
+        return result
+
+    def _wait_for_more_cards(self, driver, previous_count: int) -> bool:
+        """Wait until the listing grows past `previous_count` cards, or a quiet period passes"""
+        try:
+            self._wait_for(
+                driver, self.scroll_timeout,
+                lambda d: d.execute_script(CARD_COUNT_SCRIPT) > previous_count,
+                "more restaurant cards",
+                observe_timeout=False,  # A quiet period usually means the end of the list
+            )
+            return True
+        except TimeoutException:
+            return False
+
+    def _confirm_end_of_list(self, driver, card_count: int) -> bool:
+        """Scroll to the very bottom once more and give the listing the longest quiet period to grow"""
+        try:
+            driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
+            WebDriverWait(driver, self.scroll_timeout.maximum, poll_frequency=0.25).until(
+                lambda d: d.execute_script(CARD_COUNT_SCRIPT) > card_count
+            )
+        except TimeoutException:
+            return True
+        logging.info(f"Listing grew past {card_count} restaurants after a stall, continuing")
+        return False
+
+    def _get_restaurant_location(self, driver, restaurant_id: str, max_retries: int = 3) -> Optional[Tuple[str, str]]:
         """Get restaurant's location (postal code and city) from its menu page"""
         for attempt in range(max_retries):
+            if attempt:
+                RETRIES.labels("location_lookup").inc()
             try:
                 restaurant_url = f"{self.base_url}/speisekarte/{restaurant_id}"
                 logging.info(f"Attempt {attempt + 1}/{max_retries}: Getting location from {restaurant_url}")
                 
-                driver.get(restaurant_url)
-                time.sleep(5 + attempt * 2)  # Increase wait time with each retry
+                self._load_page(driver, restaurant_url)
+                scale = 1 + attempt * 0.5  # Allow longer waits with each retry
                 
                 try:
-                    button = WebDriverWait(driver, 10).until(
-                        EC.presence_of_element_located((By.XPATH, "//button[@data-qa='button']//div[@data-qa='text'][contains(text(), 'Über uns')]"))
+                    button = self._wait_for(
+                        driver, self.menu_page_timeout,
+                        EC.element_to_be_clickable((By.XPATH, "//button[@data-qa='button']//div[@data-qa='text'][contains(text(), 'Über uns')]")),
+                        "'Über uns' button", scale=scale
                     )
                     logging.info("Found 'Über uns' button")
                     button.click()
-                    time.sleep(3 + attempt * 1)  # Increase wait time with each retry
                     
-                    address_element = WebDriverWait(driver, 10).until(
-                        EC.presence_of_element_located((By.CSS_SELECTOR, "[data-qa='restaurant-info-modal-info-address-element']"))
+                    address_element = self._wait_for(
+                        driver, self.info_modal_timeout,
+                        self._element_with_text((By.CSS_SELECTOR, "[data-qa='restaurant-info-modal-info-address-element']")),
+                        "restaurant address", scale=scale
                     )
                     address_text = address_element.text
                     logging.info(f"Raw address text: '{address_text}'")
@@ -94,103 +246,415 @@ class LieferandoScraper:
         logging.error(f"Failed to get location after {max_retries} attempts")
         return None
 
-    async def get_ranking(self, restaurant_id: str) -> Optional[Dict]:
+    @staticmethod
+    def _element_with_text(locator):
+        """Wait condition for an element that is present and has non-empty text"""
+        def condition(driver):
+            try:
+                element = driver.find_element(*locator)
+                return element if element.text.strip() else False
+            except NoSuchElementException:
+                return False
+        return condition
+
+    async def get_ranking(self, restaurant_id: str, backend: Optional[str] = None) -> Optional[Dict]:
         """Get current ranking for a restaurant"""
-        driver = None
+        rankings = await self.get_rankings([restaurant_id], backend=backend)
+        return rankings.get(restaurant_id)
+
+    async def get_rankings(self, restaurant_ids: List[str], concurrency: int = 1,
+                           backend: Optional[str] = None, collect_listings: bool = False) -> Dict[str, Optional[Dict]]:
+        """Get current rankings for several restaurants, loading each delivery area listing only once
+
+        `backend` is "http" (plain HTTP only), "selenium" (browser only) or "auto" (HTTP first,
+        browser for whatever that could not resolve); it defaults to SCRAPER_BACKEND. With
+        `collect_listings` browser scrapes scroll every listing to its end to snapshot it, instead
+        of stopping once the restaurants are found; complete HTTP listings are snapshotted anyway.
+        """
+        backend = backend or settings.SCRAPER_BACKEND
+        results: Dict[str, Optional[Dict]] = {restaurant_id: None for restaurant_id in restaurant_ids}
+        listings: Dict[Tuple[str, str], List[Dict]] = {}
         try:
-            driver = self._create_driver()
-            
-            location = await self._get_restaurant_location(driver, restaurant_id)
-            if not location:
-                logging.warning(f"Could not get location for restaurant: {restaurant_id}")
-                return None
-                
-            postal_code, city = location
-            logging.info(f"Searching in {postal_code} {city}")
-            
-            result = await self._get_search_results(postal_code, city, restaurant_id, driver)
-            return result
+            cached_locations: Dict[str, Tuple[str, str]] = {}
+            if self.location_cache:
+                for restaurant_id in results:
+                    location = await self.location_cache.get(restaurant_id)
+                    if location:
+                        cached_locations[restaurant_id] = location
+
+            remaining = list(results)
+            if backend in ('auto', 'http'):
+                http_results, looked_up, http_listings = await self._get_rankings_http(remaining, cached_locations)
+                results.update(http_results)
+                listings.update(http_listings)
+                for restaurant_id, location in looked_up.items():
+                    cached_locations[restaurant_id] = location
+                    if self.location_cache:
+                        await self.location_cache.set(restaurant_id, location)
+
+                remaining = [restaurant_id for restaurant_id in results if results[restaurant_id] is None]
+                if backend == 'http' or not remaining:
+                    await self._save_listings(listings)
+                    return results
+                logging.info(f"Falling back to Selenium for {len(remaining)} restaurant(s)")
+
+            # Selenium blocks, so the browser work runs on the scraper thread pool
+            loop = asyncio.get_running_loop()
+            semaphore = asyncio.Semaphore(max(1, concurrency))
+
+            # Unknown locations are looked up in parallel first, so their restaurants can be grouped by area too
+            async def lookup(restaurant_id: str):
+                async with semaphore:
+                    return await loop.run_in_executor(scrape_executor, self._lookup_location_pooled, restaurant_id)
+
+            unknown = [restaurant_id for restaurant_id in remaining if restaurant_id not in cached_locations]
+            fetched = await asyncio.gather(*(lookup(i) for i in unknown), return_exceptions=True)
+            fresh_locations: Dict[str, Tuple[str, str]] = {}
+            for restaurant_id, location in zip(unknown, fetched):
+                if isinstance(location, Exception):
+                    logging.error(f"Error looking up location of {restaurant_id}: {str(location)}")
+                elif location:
+                    fresh_locations[restaurant_id] = location
+                    if self.location_cache:
+                        await self.location_cache.set(restaurant_id, location)
+
+            # Restaurants sharing an area are scraped together
+            batches: Dict[Tuple[str, str], List[str]] = {}
+            for restaurant_id in remaining:
+                location = cached_locations.get(restaurant_id) or fresh_locations.get(restaurant_id)
+                if location:
+                    batches.setdefault(location, []).append(restaurant_id)
+
+            async def scrape_batch(batch_ids: List[str]):
+                async with semaphore:
+                    batch_cached = {i: cached_locations[i] for i in batch_ids if i in cached_locations}
+                    batch_fresh = {i: fresh_locations[i] for i in batch_ids if i in fresh_locations}
+                    return await loop.run_in_executor(
+                        scrape_executor, self._scrape_rankings, batch_ids, batch_cached, batch_fresh, collect_listings
+                    )
+
+            outcomes = await asyncio.gather(
+                *(scrape_batch(batch_ids) for batch_ids in batches.values()),
+                return_exceptions=True
+            )
+
+            for outcome in outcomes:
+                if isinstance(outcome, Exception):
+                    FAILURES.labels("scrape_batch").inc()
+                    logging.error(f"Error scraping batch: {str(outcome)}")
+                    continue
+                batch_results, looked_up, batch_listings = outcome
+                results.update(batch_results)
+                listings.update(batch_listings)
+
+                if self.location_cache:
+                    for restaurant_id, location in looked_up.items():
+                        if location:
+                            await self.location_cache.set(restaurant_id, location)
+                        elif restaurant_id in cached_locations:
+                            await self.location_cache.invalidate(restaurant_id)
+
+            await self._save_listings(listings)
+
+        except Exception as e:
+            logging.error(f"Error in get_rankings: {str(e)}")
+
+        return results
+
+    async def _save_listings(self, listings: Dict[Tuple[str, str], List[Dict]]):
+        if self.listing_store and listings:
+            with span("scraper", "snapshot_write"):
+                await self.listing_store.save(listings)
+
+    async def _get_rankings_http(self, restaurant_ids: List[str], cached_locations: Dict[str, Tuple[str, str]]) -> Tuple[Dict[str, Dict], Dict[str, Tuple[str, str]], Dict[Tuple[str, str], List[Dict]]]:
+        """Rank restaurants from server-rendered pages, returning the rankings found, any locations looked up and the complete listings read"""
+        results: Dict[str, Dict] = {}
+        looked_up: Dict[str, Tuple[str, str]] = {}
+        listings: Dict[Tuple[str, str], List[Dict]] = {}
+        try:
+            unknown = [restaurant_id for restaurant_id in restaurant_ids if restaurant_id not in cached_locations]
+            fetched = await asyncio.gather(*(self.http_scraper.get_restaurant_location(i) for i in unknown))
+            looked_up = {restaurant_id: location for restaurant_id, location in zip(unknown, fetched) if location}
+            locations = {**cached_locations, **looked_up}
+
+            areas: Dict[Tuple[str, str], List[str]] = {}
+            for restaurant_id in restaurant_ids:
+                if restaurant_id in locations:
+                    areas.setdefault(locations[restaurant_id], []).append(restaurant_id)
+
+            fetched_listings = await asyncio.gather(
+                *(self.http_scraper.get_listing(postal_code, city) for postal_code, city in areas),
+                return_exceptions=True
+            )
+            for area, area_restaurant_ids, fetched_listing in zip(areas, areas.values(), fetched_listings):
+                if isinstance(fetched_listing, Exception):
+                    continue
+                listing, complete = fetched_listing
+                if not listing:
+                    continue
+                # A partial listing still ranks what it shows, but as a snapshot it would hide the rest
+                if complete:
+                    listings[area] = listing
+                positions: Dict[str, Tuple[int, Dict]] = {}
+                for rank, card in enumerate(listing, 1):
+                    if card['slug']:
+                        positions.setdefault(card['slug'], (rank, card))
+                for restaurant_id in area_restaurant_ids:
+                    if restaurant_id in positions:
+                        rank, card = positions[restaurant_id]
+                        logging.info(f"Found {restaurant_id} at rank {rank} over HTTP")
+                        results[restaurant_id] = {
+                            'restaurant_slug': restaurant_id,
+                            'rank': rank,
+                            'rating': card['rating']
+                        }
+        except Exception as e:
+            FAILURES.labels("http_lookup").inc()
+            logging.error(f"Error in HTTP ranking lookup: {str(e)}")
+
+        return results, looked_up, listings
+
+    def _scrape_rankings(self, restaurant_ids: List[str], cached_locations: Dict[str, Tuple[str, str]],
+                         fresh_locations: Optional[Dict[str, Tuple[str, str]]] = None,
+                         collect_listings: bool = False) -> Tuple[Dict[str, Optional[Dict]], Dict[str, Optional[Tuple[str, str]]], Dict[Tuple[str, str], List[Dict]]]:
+        """Blocking browser work behind get_rankings, returning the rankings, any locations looked up and the listings read
+
+        Restaurants missing from a cached location have it refreshed; `fresh_locations` were just
+        looked up and are trusted as they are.
+        """
+        results: Dict[str, Optional[Dict]] = {restaurant_id: None for restaurant_id in restaurant_ids}
+        locations = {**cached_locations, **(fresh_locations or {})}
+        looked_up: Dict[str, Optional[Tuple[str, str]]] = {}
+        listings: Optional[Dict[Tuple[str, str], List[Dict]]] = {} if self.listing_store and collect_listings else None
+        try:
+            with self.pool.driver() as driver:
+                for restaurant_id in restaurant_ids:
+                    if restaurant_id not in locations:
+                        looked_up[restaurant_id] = self._lookup_location(driver, restaurant_id)
+                        if looked_up[restaurant_id]:
+                            locations[restaurant_id] = looked_up[restaurant_id]
+
+                missing = self._rank_by_area(locations, results, driver, listings)
+
+                # Restaurants missing from their cached area may have moved: refresh and search again if it changed
+                moved: Dict[str, Tuple[str, str]] = {}
+                for restaurant_id in missing:
+                    if restaurant_id not in cached_locations:
+                        continue
+                    postal_code, city = locations[restaurant_id]
+                    logging.info(f"{restaurant_id} not found in cached area {postal_code} {city}, refreshing location")
+                    fresh_location = self._lookup_location(driver, restaurant_id)
+                    looked_up[restaurant_id] = fresh_location
+                    if fresh_location and fresh_location != locations[restaurant_id]:
+                        moved[restaurant_id] = fresh_location
+                if moved:
+                    self._rank_by_area(moved, results, driver, listings)
 
         except Exception as e:
-            logging.error(f"Error in get_ranking: {str(e)}")
+            FAILURES.labels("scrape_batch").inc()
+            logging.error(f"Error scraping rankings: {str(e)}")
+
+        return results, looked_up, listings or {}
+
+    def _rank_by_area(self, locations: Dict[str, Tuple[str, str]], results: Dict[str, Optional[Dict]], driver,
+                      listings: Optional[Dict[Tuple[str, str], List[Dict]]] = None) -> List[str]:
+        """Scan each distinct area listing once for all restaurants located there, returning the ones not found
+
+        If `listings` is given, every area's complete listing is scrolled through and added to it.
+        """
+        areas: Dict[Tuple[str, str], List[str]] = {}
+        for restaurant_id, location in locations.items():
+            areas.setdefault(location, []).append(restaurant_id)
+
+        missing = []
+        for (postal_code, city), area_restaurant_ids in areas.items():
+            logging.info(f"Searching in {postal_code} {city} for {len(area_restaurant_ids)} restaurant(s)")
+
+            listing = [] if listings is not None else None
+            found = self._get_search_results(postal_code, city, area_restaurant_ids, driver, listing)
+            if listing:
+                listings[(postal_code, city)] = listing
+            for restaurant_id in area_restaurant_ids:
+                if restaurant_id in found:
+                    results[restaurant_id] = found[restaurant_id]
+                else:
+                    missing.append(restaurant_id)
+        return missing
+
+    def _lookup_location_pooled(self, restaurant_id: str) -> Optional[Tuple[str, str]]:
+        """Blocking location lookup on a driver of its own"""
+        with self.pool.driver() as driver:
+            return self._lookup_location(driver, restaurant_id)
+
+    def _lookup_location(self, driver, restaurant_id: str) -> Optional[Tuple[str, str]]:
+        """Get a restaurant's location from its menu page"""
+        with span("selenium", "location_lookup"):
+            location = self._get_restaurant_location(driver, restaurant_id)
+        if not location:
+            FAILURES.labels("location_lookup").inc()
+            logging.warning(f"Could not get location for restaurant: {restaurant_id}")
+        return location
+
+    @staticmethod
+    def _slug_from_url(url: str) -> str:
+        """Extract the restaurant slug from a /speisekarte/{slug} link"""
+        return urlparse(url).path.rstrip('/').split('/')[-1]
+
+    @staticmethod
+    def _parse_rating(rating_text: Optional[str]) -> Optional[float]:
+        """Parse a rating such as '4,5 (123)' into a float"""
+        try:
+            return float(rating_text.strip().split()[0].replace(',', '.'))
+        except (AttributeError, ValueError, IndexError):
+            logging.warning("Rating not found or invalid for restaurant")
             return None
-            
-        finally:
-            if driver:
-                try:
-                    driver.quit()
-                except:
-                    pass
 
-    async def _get_search_results(self, postal_code: str, city: str, target_restaurant_id: str, driver) -> Optional[Dict]:
-        """Get search results using Selenium"""
+    def _extract_cards(self, driver, parent_container, start: int, targets: Optional[Iterable[str]]) -> List[Dict]:
+        """Get position, href and rating text of every card after the first `start` ones"""
+        if self.bulk_extraction:
+            try:
+                cards = driver.execute_script(EXTRACT_CARDS_SCRIPT, start)
+                if isinstance(cards, list):
+                    CARDS_SCANNED.labels("selenium").inc(len(cards))
+                    return cards
+                logging.warning("Bulk card extraction returned no list, falling back to per-element extraction")
+            except Exception as e:
+                logging.warning(f"Bulk card extraction failed, falling back to per-element extraction: {str(e)}")
+
+        cards = []
+        restaurant_cards = parent_container.find_elements(By.CSS_SELECTOR, "[data-qa='restaurant-card']")
+        for position, card in enumerate(restaurant_cards[start:], start + 1):
+            href = None
+            rating_text = None
+            try:
+                link = card.find_element(By.TAG_NAME, "a")
+                href = link.get_attribute('href')
+                # Ratings are only looked up for targets to keep the WebDriver round-trips down
+                if targets is None or self._slug_from_url(href or '') in targets:
+                    try:
+                        rating_text = card.find_element(By.CSS_SELECTOR, "[data-qa='restaurant-ratings']").text
+                    except NoSuchElementException:
+                        pass
+            except Exception as e:
+                logging.warning(f"Error processing restaurant card: {str(e)}")
+            cards.append({'position': position, 'href': href, 'rating': rating_text})
+        CARDS_SCANNED.labels("selenium").inc(len(cards))
+        return cards
+
+    def _get_search_results(self, postal_code: str, city: str, target_restaurant_ids: Iterable[str], driver,
+                            listing: Optional[List[Dict]] = None) -> Dict[str, Dict]:
+        """Scroll an area listing once and get rank and rating of every target restaurant found in it
+
+        If `listing` is given, scrolling continues to the end of the list and every card's slug and
+        rating is appended to it in order.
+        """
+        remaining = set(target_restaurant_ids)
+        found: Dict[str, Dict] = {}
         try:
             url = f"{self.base_url}/lieferservice/essen/{postal_code}-{city.lower()}"
             logging.info(f"Searching: {url}")
             
-            driver.get(url)
-            time.sleep(10)  # Initial wait for page load
+            self._load_page(driver, url)
             
             try:
-                parent_container = driver.find_element(By.CSS_SELECTOR, "[data-qa='list-all-open-content']")
+                with span("selenium", "listing_load"):
+                    parent_container = self._wait_for(
+                        driver, self.listing_timeout,
+                        EC.presence_of_element_located((By.CSS_SELECTOR, "[data-qa='list-all-open-content']")),
+                        "restaurant list"
+                    )
+                    self._wait_for_more_cards(driver, 0)
                 rank = 0
-                previous_restaurant_count = 0
                 unchanged_count = 0  # Counter for when restaurant count doesn't change
                 
                 while True:
-                    restaurant_cards = parent_container.find_elements(By.CSS_SELECTOR, "[data-qa='restaurant-card']")
-                    current_restaurant_count = len(restaurant_cards)
+                    # Snapshots need every card's rating
+                    with span("selenium", "card_extraction"):
+                        new_cards = self._extract_cards(driver, parent_container, rank, remaining if listing is None else None)
                     
-                    if current_restaurant_count == previous_restaurant_count:
+                    if not new_cards:
                         unchanged_count += 1
-                        if unchanged_count >= 3:
+                        if unchanged_count >= 2:
+                            if not self._confirm_end_of_list(driver, rank):
+                                unchanged_count = 0
+                                continue
                             logging.warning(f"No new restaurants found after {rank} entries - stopping search")
-                            return None
+                            return found
                     else:
                         unchanged_count = 0  # Reset counter when we find new restaurants
                     
-                    for card in restaurant_cards[rank:]:
-                        rank += 1
-                        try:
-                            link = card.find_element(By.TAG_NAME, "a")
-                            url = link.get_attribute('href')
-                            
-                            if target_restaurant_id in url:
-                                try:
-                                    rating = card.find_element(By.CSS_SELECTOR, "[data-qa='restaurant-ratings']")
-                                    rating_text = rating.text.strip()
-                                    rating_value = float(rating_text.split()[0].replace(',', '.'))
-                                except (NoSuchElementException, ValueError, IndexError):
-                                    rating_value = None
-                                    logging.warning("Rating not found or invalid for restaurant")
-                                
-                                logging.info(f"Found target restaurant at rank {rank}")
-                                return {
-                                    'restaurant_slug': target_restaurant_id,
-                                    'rank': rank,
-                                    'rating': rating_value
-                                }
-                        except Exception as e:
-                            logging.warning(f"Error processing restaurant card: {str(e)}")
-                            continue
-                    
-                    previous_restaurant_count = current_restaurant_count
-                    
-                    last_height = driver.execute_script("return document.body.scrollHeight")
-                    driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-                    time.sleep(3)
+                    for card in new_cards:
+                        rank = card['position']
+                        slug = self._slug_from_url(card['href'] or '')
+                        if listing is not None:
+                            listing.append({
+                                'slug': slug or None,
+                                'rating': self._parse_rating(card['rating']) if card['rating'] else None
+                            })
+                        
+                        if slug in remaining:
+                            logging.info(f"Found {slug} at rank {rank}")
+                            found[slug] = {
+                                'restaurant_slug': slug,
+                                'rank': rank,
+                                'rating': self._parse_rating(card['rating'])
+                            }
+                            remaining.discard(slug)
+                            if not remaining and listing is None:
+                                return found
                     
-                    new_height = driver.execute_script("return document.body.scrollHeight")
-                    if new_height == last_height and unchanged_count >= 2:
+                    SCROLL_ITERATIONS.inc()
+                    with span("selenium", "scroll"):
+                        driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
+                        more_cards = self._wait_for_more_cards(driver, rank)
+                    if not more_cards and unchanged_count >= 1:
+                        if not self._confirm_end_of_list(driver, rank):
+                            continue
                         logging.warning(f"Reached end of list after checking {rank} restaurants")
-                        return None
+                        return found
                     
                     logging.info(f"Scrolled, checked {rank} restaurants so far")
                 
             except Exception as e:
+                FAILURES.labels("listing").inc()
                 logging.error(f"Error finding main restaurant list: {str(e)}")
-                return None
+                self._discard_partial_listing(listing)
+                return found
             
         except Exception as e:
+            FAILURES.labels("listing").inc()
             logging.error(f"Error in get_search_results: {str(e)}")
-            return None 
+            self._discard_partial_listing(listing)
+            return found
+
+    @staticmethod
+    def _discard_partial_listing(listing: Optional[List[Dict]]):
+        """A truncated listing would make restaurants past the cut look delisted"""
+        if listing:
+            logging.warning(f"Discarding partial listing of {len(listing)} restaurants")
+            listing.clear()
+
+
+# Drivers are shared by every scraper instance in the process
+driver_pool = DriverPool(
+    factory=LieferandoScraper._create_driver,
+    size=settings.DRIVER_POOL_SIZE,
+    max_uses=settings.DRIVER_MAX_USES,
+    max_memory_mb=settings.DRIVER_MAX_MEMORY_MB,
+    checkout_timeout=settings.DRIVER_CHECKOUT_TIMEOUT_SECONDS,
+)
+
+# Politeness towards lieferando.de is enforced per host across all scraper threads
+shared_rate_limiter = HostRateLimiter(
+    requests_per_minute=settings.RATE_LIMIT_REQUESTS_PER_MINUTE,
+    burst=settings.RATE_LIMIT_BURST,
+)
+
+# Pooled HTTP session for the lightweight backend
+shared_http_scraper = LieferandoHttpScraper(rate_limiter=shared_rate_limiter)
+
+# Bounds how many scrapes run at once; API coroutines await these threads instead of blocking the event loop
+scrape_executor = ThreadPoolExecutor(
+    max_workers=settings.SCRAPER_MAX_WORKERS,
+    thread_name_prefix="scraper",
+)
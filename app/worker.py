@@ -0,0 +1,192 @@
+"""Scraper worker: runs refresh jobs and the ranking scheduler outside the API process
+
+    python -m app.worker --processes 2
+
+Starts a supervisor that keeps `--processes` worker processes running. Each worker runs the
+refresh job runner and the ranking scheduler with its own driver pool. Workers that exit are
+restarted, and a worker whose memory (including its browsers) exceeds WORKER_MAX_MEMORY_MB is
+asked to finish its current work and is replaced.
+"""
+from app.config import settings
+from app.utils.driver_pool import process_tree_memory_mb
+import argparse
+import asyncio
+import logging
+import multiprocessing
+import os
+import signal
+import time
+from typing import List, Optional
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(processName)s - %(message)s')
+
+CHECK_INTERVAL_SECONDS = 5
+
+
+async def run_worker():
+    """Run the job runner and scheduler until SIGTERM or SIGINT"""
+    # Imported here so the supervisor never creates drivers, thread pools or connections of its own
+    from app.models.database import engine
+    from app.services.ranking_service import RankingService
+    from app.services.job_service import JobService
+    from app.utils.scheduler import RankingScheduler
+    from app.utils.scraper import driver_pool, scrape_executor, shared_http_scraper
+
+    ranking_service = RankingService()
+    job_service = JobService(ranking_service)
+    scheduler = RankingScheduler(ranking_service)
+
+    def stop():
+        logging.info("Worker stopping after its current work...")
+        scheduler.stop()
+        job_service.stop()
+
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, stop)
+
+    loop.run_in_executor(None, driver_pool.warm)
+    scheduler_task = asyncio.create_task(scheduler.start())
+    try:
+        await job_service.run()
+        # Let a running cycle finish so its restaurants are released instead of waiting out their lease
+        await scheduler_task
+    finally:
+        await shared_http_scraper.close()
+        scrape_executor.shutdown(wait=False)
+        driver_pool.close()
+        await engine.dispose()
+        logging.info("Worker stopped")
+
+
+def worker_main(slot: int = 0, processes: int = 1):
+    # Chrome and chromedriver are children of the worker; a process group of its own lets the
+    # supervisor kill them together with it instead of orphaning them
+    os.setsid()
+    # Each process has its own rate limiter, so each gets its share of the limit on lieferando.de
+    shares = processes * max(1, settings.WORKER_REPLICAS)
+    settings.RATE_LIMIT_REQUESTS_PER_MINUTE /= shares
+    settings.RATE_LIMIT_BURST = max(1, settings.RATE_LIMIT_BURST // shares)
+    logging.info(f"Rate limit of this worker: {settings.RATE_LIMIT_REQUESTS_PER_MINUTE:.1f} requests per minute")
+    if settings.WORKER_METRICS_PORT:
+        # Each worker has its own metrics, so each gets its own port
+        from prometheus_client import start_http_server
+        port = settings.WORKER_METRICS_PORT + slot
+        try:
+            start_http_server(port)
+            logging.info(f"Serving metrics on port {port}")
+        except OSError as e:
+            # A retiring worker in the same slot may still hold the port
+            logging.warning(f"Not serving metrics, port {port} unavailable: {e}")
+    asyncio.run(run_worker())
+
+
+class WorkerSupervisor:
+    """Keeps a fixed number of worker processes alive and within their memory cap"""
+
+    def __init__(self, processes: int, max_memory_mb: int, grace_seconds: int):
+        self.context = multiprocessing.get_context("spawn")  # Fresh interpreters, no inherited threads or sockets
+        self.processes: List[Optional[multiprocessing.Process]] = [None] * processes
+        self.max_memory_mb = max_memory_mb
+        self.grace_seconds = grace_seconds
+        self.retiring: List[tuple] = []  # (process, deadline) of workers asked to stop
+        self.is_running = False
+
+    def start(self, slot: int):
+        process = self.context.Process(target=worker_main, args=(slot, len(self.processes)), name=f"worker-{slot}")
+        process.start()
+        self.processes[slot] = process
+        logging.info(f"Started {process.name} (pid {process.pid})")
+
+    def run(self):
+        """Start the workers and supervise them until SIGTERM or SIGINT"""
+        self.is_running = True
+        signal.signal(signal.SIGTERM, lambda *_: self.stop())
+        signal.signal(signal.SIGINT, lambda *_: self.stop())
+
+        for slot in range(len(self.processes)):
+            self.start(slot)
+
+        while True:
+            time.sleep(CHECK_INTERVAL_SECONDS)
+            # Workers are stopping with the supervisor, so don't mistake their exit for a crash
+            if not self.is_running:
+                break
+            self.check()
+
+        self.shutdown()
+
+    def stop(self):
+        self.is_running = False
+
+    def check(self):
+        for slot, process in enumerate(self.processes):
+            if not process.is_alive():
+                logging.warning(f"{process.name} exited with code {process.exitcode}, restarting")
+                self.kill(process)  # Browsers of a crashed worker outlive it
+                self.start(slot)
+                continue
+
+            memory_mb = process_tree_memory_mb(process.pid)
+            if memory_mb is not None and memory_mb > self.max_memory_mb:
+                # The replacement starts right away; the old worker gets the grace period to finish
+                logging.warning(f"{process.name} uses {memory_mb:.0f} MB (limit {self.max_memory_mb} MB), replacing it")
+                self.retire(process)
+                self.start(slot)
+
+        still_retiring = []
+        for process, deadline in self.retiring:
+            if process.is_alive() and time.monotonic() > deadline:
+                logging.warning(f"Killing {process.name} (pid {process.pid}) after {self.grace_seconds}s grace period")
+                self.kill(process)
+            elif process.is_alive():
+                still_retiring.append((process, deadline))
+        self.retiring = still_retiring
+
+    @staticmethod
+    def kill(process: multiprocessing.Process):
+        """SIGKILL a worker together with its browsers"""
+        try:
+            os.killpg(process.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass  # Nothing left of the group
+
+    def retire(self, process: multiprocessing.Process):
+        process.terminate()
+        self.retiring.append((process, time.monotonic() + self.grace_seconds))
+
+    def shutdown(self):
+        logging.info("Stopping workers...")
+        for process in self.processes:
+            if process.is_alive():
+                self.retire(process)
+        deadline = time.monotonic() + self.grace_seconds
+        for process, _ in self.retiring:
+            process.join(max(0, deadline - time.monotonic()))
+            if process.is_alive():
+                logging.warning(f"Killing {process.name} (pid {process.pid})")
+                self.kill(process)
+                process.join()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run scraper worker processes')
+    parser.add_argument('--processes', type=int, default=settings.WORKER_PROCESSES, help='Number of worker processes')
+    parser.add_argument('--max-memory-mb', type=int, default=settings.WORKER_MAX_MEMORY_MB,
+                        help='Replace a worker once it and its browsers use more memory than this')
+
+    args = parser.parse_args()
+
+    from app.models.ranking import init_db
+    from app.models.database import engine
+
+    async def prepare():
+        await init_db()
+        await engine.dispose()
+
+    asyncio.run(prepare())
+    WorkerSupervisor(args.processes, args.max_memory_mb, settings.WORKER_SHUTDOWN_GRACE_SECONDS).run()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,26 @@
+from app.utils.adaptive_timeout import AdaptiveTimeout
+import pytest
+
+
+def test_initial_timeout():
+    assert AdaptiveTimeout(initial=6, minimum=1, maximum=20).timeout == pytest.approx(6)
+
+
+def test_timeout_follows_observed_waits():
+    timeout = AdaptiveTimeout(initial=6, minimum=1, maximum=20, headroom=3, smoothing=0.5)
+    timeout.observe(1.0)
+    assert timeout.estimate == pytest.approx(1.5)
+    assert timeout.timeout == pytest.approx(4.5)
+    for _ in range(20):
+        timeout.observe(1.0)
+    assert timeout.timeout == pytest.approx(3.0, abs=0.01)
+
+
+def test_timeout_is_clamped_to_bounds():
+    timeout = AdaptiveTimeout(initial=6, minimum=3, maximum=10)
+    for _ in range(50):
+        timeout.observe(0.01)
+    assert timeout.timeout == 3
+    for _ in range(50):
+        timeout.observe(60)
+    assert timeout.timeout == 10
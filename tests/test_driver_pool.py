@@ -0,0 +1,123 @@
+from app.utils.driver_pool import DriverPool
+import pytest
+import threading
+import time
+
+
+class FakeDriver:
+    """Stands in for a Chrome driver"""
+
+    def __init__(self):
+        self.quit_called = False
+
+    def execute_script(self, script):
+        return 1
+
+    def quit(self):
+        self.quit_called = True
+
+
+def make_pool(size: int = 2, max_uses: int = 10, checkout_timeout: float = 5.0) -> DriverPool:
+    return DriverPool(FakeDriver, size=size, max_uses=max_uses, max_memory_mb=1024,
+                      checkout_timeout=checkout_timeout)
+
+
+def wait_for(condition, timeout: float = 2.0) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return condition()
+
+
+def test_checkout_and_checkin_reuse_a_warm_driver():
+    pool = make_pool()
+    pool.warm()
+    assert pool.stats()['idle'] == 2
+
+    pooled = pool.checkout()
+    assert pool.stats()['in_use'] == 1
+    pool.checkin(pooled)
+    assert pool.checkout() is pooled
+
+    stats = pool.stats()
+    assert stats['created'] == 2
+    assert stats['checkouts'] == 2
+    pool.close()
+
+
+def test_checkout_starts_a_driver_when_there_is_room():
+    pool = make_pool()
+    with pool.driver() as driver:
+        assert isinstance(driver, FakeDriver)
+    assert pool.stats()['created'] == 1
+    assert pool.stats()['idle'] == 1
+    pool.close()
+
+
+def test_driver_is_recycled_at_max_uses_and_replaced():
+    pool = make_pool(size=1, max_uses=2)
+    pool.warm()
+    pooled = pool.checkout()
+    pool.checkin(pooled)
+    assert pool.checkout() is pooled
+    pool.checkin(pooled)
+
+    assert pooled.driver.quit_called
+    assert pool.stats()['recycled'] == 1
+    # The replacement is started in the background
+    assert wait_for(lambda: pool.stats()['idle'] == 1)
+    replacement = pool.checkout()
+    assert replacement is not pooled
+    assert replacement.uses == 0
+    assert pool.stats()['created'] == 2
+    pool.close()
+
+
+def test_discarded_driver_is_recycled():
+    pool = make_pool(size=1)
+    with pytest.raises(ValueError):
+        with pool.driver():
+            raise ValueError("page broke")
+    assert pool.stats()['recycled'] == 1
+    assert wait_for(lambda: pool.stats()['idle'] == 1)
+    pool.close()
+
+
+def test_checkout_times_out_when_pool_is_exhausted():
+    pool = make_pool(size=1, checkout_timeout=0.1)
+    pooled = pool.checkout()
+    start = time.monotonic()
+    with pytest.raises(TimeoutError):
+        pool.checkout()
+    assert time.monotonic() - start >= 0.1
+    pool.checkin(pooled)
+    pool.close()
+
+
+def test_checkout_waits_for_a_checkin():
+    pool = make_pool(size=1)
+    pooled = pool.checkout()
+    threading.Timer(0.05, pool.checkin, args=(pooled,)).start()
+    assert pool.checkout() is pooled
+    pool.close()
+
+
+def test_close_with_drivers_checked_out():
+    pool = make_pool()
+    pool.warm()
+    checked_out = pool.checkout()
+    idle = pool._idle[0]
+
+    pool.close()
+    assert idle.driver.quit_called
+    assert not checked_out.driver.quit_called
+    with pytest.raises(RuntimeError):
+        pool.checkout()
+
+    pool.checkin(checked_out)
+    assert checked_out.driver.quit_called
+    stats = pool.stats()
+    assert stats['idle'] == 0
+    assert stats['in_use'] == 0
@@ -0,0 +1,51 @@
+from app.utils.http_scraper import parse_listing, parse_restaurant_location
+from pathlib import Path
+import pytest
+
+FIXTURES = Path(__file__).parent / "fixtures"
+
+
+def fixture(name: str) -> str:
+    return (FIXTURES / name).read_text(encoding="utf-8")
+
+
+@pytest.mark.parametrize("page, location", [
+    ("menu_json_ld.html", ("50226", "Frechen")),
+    ("menu_modal.html", ("50674", "Köln")),
+    ("menu_next_data.html", ("10119", "Berlin")),
+    ("menu_without_address.html", None),
+])
+def test_parse_restaurant_location(page, location):
+    assert parse_restaurant_location(fixture(page)) == location
+
+
+def test_parse_listing_from_data_qa_markup():
+    cards, complete = parse_listing(fixture("listing_data_qa.html"))
+    assert cards == [
+        {'slug': "happy-slice-pizza", 'rating': 4.6},
+        {'slug': "loco-chicken-i-frechen", 'rating': 4.5},
+        {'slug': "neu-eroeffnet", 'rating': None},
+    ]
+    # Server-rendered cards may only be the first batch of the listing
+    assert not complete
+
+
+def test_parse_listing_from_next_data():
+    cards, complete = parse_listing(fixture("listing_next_data.html"))
+    assert cards == [
+        {'slug': "happy-slice-pizza", 'rating': 4.6},
+        {'slug': "loco-chicken-i-frechen", 'rating': 4.5},
+        {'slug': "neu-eroeffnet", 'rating': None},
+    ]
+    assert complete
+
+
+def test_parse_listing_short_of_total_count_is_partial():
+    cards, complete = parse_listing(fixture("listing_next_data_partial.html"))
+    assert [card['slug'] for card in cards] == ["happy-slice-pizza", "loco-chicken-i-frechen"]
+    assert [card['rating'] for card in cards] == [4.6, 4.5]
+    assert not complete
+
+
+def test_parse_listing_without_listing():
+    assert parse_listing(fixture("menu_json_ld.html")) == (None, False)
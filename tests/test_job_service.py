@@ -0,0 +1,55 @@
+from app.config import settings
+from app.models.database import async_database_url
+from app.models.ranking import ScrapeJob, create_schema
+from app.services.job_service import JobService
+from sqlalchemy import delete, select, update
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from types import SimpleNamespace
+import asyncio
+import pytest
+
+SLUG = "test-job-service-restaurant"
+
+
+async def _enqueue_repeatedly(times: int):
+    # One connection that plans every statement generically, as asyncpg's cached statements
+    # end up being after five executions
+    engine = create_async_engine(
+        async_database_url(settings.DATABASE_URL), pool_size=1, max_overflow=0,
+        connect_args={'server_settings': {'plan_cache_mode': 'force_generic_plan'}},
+    )
+    try:
+        async with engine.begin() as conn:
+            await conn.run_sync(create_schema)
+        session_factory = async_sessionmaker(bind=engine, expire_on_commit=False)
+        jobs = JobService(SimpleNamespace(SessionLocal=session_factory))
+        async with session_factory() as session:
+            await session.execute(delete(ScrapeJob).where(ScrapeJob.restaurant_slug == SLUG))
+            await session.commit()
+
+        queued = []
+        for _ in range(times):
+            job = await jobs.enqueue(SLUG)
+            duplicate = await jobs.enqueue(SLUG)
+            assert duplicate['id'] == job['id']
+            queued.append(job['id'])
+            async with session_factory() as session:
+                await session.execute(update(ScrapeJob).where(ScrapeJob.id == job['id']).values(status="done"))
+                await session.commit()
+
+        async with session_factory() as session:
+            stored = (await session.scalars(select(ScrapeJob.id).where(ScrapeJob.restaurant_slug == SLUG))).all()
+            await session.execute(delete(ScrapeJob).where(ScrapeJob.restaurant_slug == SLUG))
+            await session.commit()
+        return queued, stored
+    finally:
+        await engine.dispose()
+
+
+def test_enqueue_attaches_duplicates_on_one_connection():
+    try:
+        queued, stored = asyncio.run(_enqueue_repeatedly(8))
+    except OSError as e:
+        pytest.skip(f"No database at DATABASE_URL: {e}")
+    assert len(set(queued)) == 8
+    assert sorted(stored) == sorted(queued)
@@ -0,0 +1,50 @@
+from app.utils.rate_limiter import HostRateLimiter, TokenBucket
+import asyncio
+import pytest
+import time
+
+
+def test_bucket_allows_a_burst_then_spaces_requests():
+    bucket = TokenBucket(rate=10, capacity=2)
+    assert bucket.try_acquire() == 0
+    assert bucket.try_acquire() == 0
+    delay = bucket.try_acquire()
+    assert 0 < delay <= 0.1
+
+
+def test_bucket_refills_over_time_up_to_capacity():
+    bucket = TokenBucket(rate=50, capacity=2)
+    bucket.try_acquire()
+    bucket.try_acquire()
+    time.sleep(0.1)
+    assert bucket.try_acquire() == 0
+    assert bucket.try_acquire() == 0
+    assert bucket.try_acquire() > 0
+
+
+def test_acquire_blocks_until_a_token_is_available():
+    bucket = TokenBucket(rate=20, capacity=1)
+    assert bucket.acquire() == 0
+    start = time.monotonic()
+    waited = bucket.acquire()
+    assert waited == pytest.approx(0.05, abs=0.02)
+    assert time.monotonic() - start >= 0.04
+
+
+def test_acquire_async_waits_without_blocking():
+    bucket = TokenBucket(rate=20, capacity=1)
+
+    async def run():
+        await bucket.acquire_async()
+        return await asyncio.gather(bucket.acquire_async(), asyncio.sleep(0.01, "loop ran"))
+
+    waited, other = asyncio.run(run())
+    assert waited > 0
+    assert other == "loop ran"
+
+
+def test_host_limiter_keeps_one_bucket_per_host():
+    limiter = HostRateLimiter(requests_per_minute=60, burst=1)
+    assert limiter.acquire("https://www.lieferando.de/speisekarte/a") == 0
+    assert limiter.acquire("https://other.example/b") == 0
+    assert limiter._bucket("https://www.lieferando.de/lieferservice/essen/koeln-50667").try_acquire() > 0